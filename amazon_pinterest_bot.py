@@ -1,10 +1,16 @@
 import os
-import requests
 from bs4 import BeautifulSoup
 import time
 import random
 import json
 from urllib.parse import urljoin
+import argparse
+import logging
+from scripts.http_transport import get_transport
+from scripts.scheduler import Scheduler, parse_times
+from scripts.log_setup import setup_logging, correlation_id
+from scripts.rate_limiter import RateLimiter
+from concurrent.futures import ThreadPoolExecutor
 
 class AmazonPinterestBot:
     def __init__(self):
@@ -12,9 +18,19 @@ class AmazonPinterestBot:
         self.pinterest_password = os.getenv('PINTEREST_PASSWORD')
         self.affiliate_tag = os.getenv('AMAZON_AFFILIATE_TAG')
         self.board_name = os.getenv('PINTEREST_BOARD_NAME', 'Amazon Deals')
+        self.board_cache_path = os.getenv('BOARD_CACHE_PATH', os.path.join('cache', 'pinterest_boards.json'))
+        self.board_cache_ttl = float(os.getenv('BOARD_CACHE_TTL', '86400'))
         
-        self.session = requests.Session()
-        self.pinterest_session = requests.Session()
+        # One limiter shared by all pin sender threads
+        self.pin_workers = int(os.getenv('BOT_PIN_WORKERS', '2'))
+        self.pin_limiter = RateLimiter(float(os.getenv('BOT_PIN_INTERVAL', '20')), float(os.getenv('BOT_PIN_JITTER', '15')))
+        
+        # Pooled per-host sessions from the shared transport; the Pinterest one keeps the login cookies
+        self.transport = get_transport()
+        # One GET per category page, a 429 or an error is handled in get_bestsellers
+        self.transport.set_host_retries('https://www.amazon.com', 0)
+        self.session = self.transport.session_for('https://www.amazon.com')
+        self.pinterest_session = self.transport.session_for('https://www.pinterest.com')
         
         # Rotating User Agents
         self.user_agents = [
@@ -49,35 +65,83 @@ class AmazonPinterestBot:
         response = self.pinterest_session.post(login_url, data=login_data, headers=headers)
         return response.status_code == 200
     
-    def get_board_id(self):
+    def fetch_boards(self, page_size=250, max_pages=20):
+        """Fetch every board of the account, following pagination bookmarks"""
         boards_url = 'https://www.pinterest.com/resource/BoardsResource/get/'
-        params = {
-            'source_url': f'/{self.pinterest_email.split("@")[0]}/',
-            'data': json.dumps({
-                'options': {'username': self.pinterest_email.split('@')[0]},
-                'context': {}
-            })
-        }
+        username = self.pinterest_email.split('@')[0]
+        boards = []
+        bookmark = None
 
-        response = self.pinterest_session.get(boards_url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            boards = data.get('resource_response', {}).get('data', [])
-            
-            print(f"📋 Available boards:")
-            for board in boards:
-                print(f"- {board.get('name')} (ID: {board.get('id')})")
-            
-            for board in boards:
-                if board.get('name', '').strip().lower() == self.board_name.strip().lower():
-                    print(f"✅ Match found for board: {board.get('name')}")
-                    return board.get('id')
-            print(f"❌ Board '{self.board_name}' not found in list.")
-        else:
-            print(f"❌ Failed to fetch boards: {response.status_code}")
+        for _ in range(max_pages):
+            options = {'username': username, 'page_size': page_size}
+            if bookmark:
+                options['bookmarks'] = [bookmark]
+            params = {
+                'source_url': f'/{username}/',
+                'data': json.dumps({
+                    'options': options,
+                    'context': {}
+                })
+            }
+
+            response = self.pinterest_session.get(boards_url, params=params)
+            if response.status_code != 200:
+                logging.error(f"❌ Failed to fetch boards: {response.status_code}")
+                return None
+
+            resource_response = response.json().get('resource_response', {})
+            boards.extend({'id': board.get('id'), 'name': board.get('name', '')} for board in resource_response.get('data') or [])
+            bookmark = resource_response.get('bookmark')
+            if not bookmark or bookmark == '-end-':
+                break
+
+        logging.info(f"📋 Fetched {len(boards)} boards")
+        return boards
+
+    def load_cached_boards(self):
+        try:
+            with open(self.board_cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cache.get('email') != self.pinterest_email or time.time() - cache.get('fetched_at', 0) > self.board_cache_ttl:
+            return None
+        return cache.get('boards')
+
+    def save_cached_boards(self, boards):
+        try:
+            os.makedirs(os.path.dirname(self.board_cache_path) or '.', exist_ok=True)
+            with open(self.board_cache_path, 'w') as f:
+                json.dump({'email': self.pinterest_email, 'fetched_at': time.time(), 'boards': boards}, f)
+        except OSError as e:
+            logging.warning(f"Failed to cache boards: {e}")
+
+    def find_board(self, boards):
+        for board in boards:
+            if board.get('name', '').strip().lower() == self.board_name.strip().lower():
+                logging.info(f"✅ Match found for board: {board.get('name')}")
+                return board.get('id')
         return None
 
-    
+    def get_board_id(self):
+        """Resolve the board name to an ID, from the on-disk cache when it is fresh"""
+        boards = self.load_cached_boards()
+        if boards:
+            board_id = self.find_board(boards)
+            if board_id:
+                return board_id
+            # The board may have been created since the cache was written
+
+        boards = self.fetch_boards()
+        if boards is None:
+            return None
+        self.save_cached_boards(boards)
+
+        board_id = self.find_board(boards)
+        if not board_id:
+            logging.error(f"❌ Board '{self.board_name}' not found in list.")
+        return board_id
+
     def get_bestsellers(self, category_url):
         headers = {
             'User-Agent': random.choice(self.user_agents),
@@ -93,7 +157,7 @@ class AmazonPinterestBot:
         try:
             response = self.session.get(category_url, headers=headers, timeout=15)
             if response.status_code == 429:
-                print("Rate limited, waiting longer...")
+                logging.warning("Rate limited, waiting longer...")
                 time.sleep(random.uniform(30, 60))
                 return []
                 
@@ -155,7 +219,7 @@ class AmazonPinterestBot:
                     continue
                     
         except Exception as e:
-            print(f"Error scraping {category_url}: {str(e)}")
+            logging.error(f"Error scraping {category_url}: {str(e)}")
             
         # Longer delay after scraping
         time.sleep(random.uniform(8, 15))
@@ -184,8 +248,6 @@ class AmazonPinterestBot:
             })
         }
         
-        time.sleep(random.uniform(5, 10))  # Rate limiting for Pinterest
-        
         try:
             response = self.pinterest_session.post(pin_url, data=pin_data, headers=headers)
             return response.status_code == 200
@@ -194,42 +256,79 @@ class AmazonPinterestBot:
     
     def run(self):
         if not self.login_pinterest():
-            print("❌ Pinterest login failed")
+            logging.error("❌ Pinterest login failed")
             return
             
         board_id = self.get_board_id()
         if not board_id:
-            print("❌ Board not found")
+            logging.error("❌ Board not found")
             return
             
-        print("✅ Pinterest authenticated")
+        logging.info("✅ Pinterest authenticated")
         
         categories = [
             'https://www.amazon.com/Best-Sellers-Electronics/zgbs/electronics',
             'https://www.amazon.com/Best-Sellers-Home-Kitchen/zgbs/home-garden'
         ]
         
-        total_pins = 0
-        for i, category in enumerate(categories):
-            print(f"🔍 Scraping category {i+1}/{len(categories)}")
-            products = self.get_bestsellers(category)
-            
-            for product in products:
-                if self.create_pinterest_pin(product, board_id):
-                    total_pins += 1
-                    print(f"✅ Pinned: {product['title'][:40]}...")
-                else:
-                    print(f"❌ Failed: {product['title'][:40]}...")
+        # Pins are sent in the background while the next category is scraped
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.pin_workers) as executor:
+            for i, category in enumerate(categories):
+                logging.info(f"🔍 Scraping category {i+1}/{len(categories)}")
+                products = self.get_bestsellers(category)
                 
-                # Longer delays between pins
-                time.sleep(random.uniform(15, 25))
-            
-            # Much longer delay between categories
-            if i < len(categories) - 1:
-                time.sleep(random.uniform(60, 120))
+                for product in products:
+                    futures.append(executor.submit(self.send_pin, product, board_id))
+                
+                # Much longer delay between categories
+                if i < len(categories) - 1:
+                    time.sleep(random.uniform(60, 120))
         
-        print(f"🎯 Total pins created: {total_pins}")
+        results = [future.result() for future in futures]
+        total_pins = sum(1 for result in results if result['ok'])
+        if results:
+            latencies = sorted(result['latency'] for result in results)
+            logging.info(f"Pin latency: median {latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s")
+        
+        logging.info(f"🎯 Total pins created: {total_pins}/{len(results)}")
+        self.transport.log_stats()
+        return results
+
+    def send_pin(self, product, board_id):
+        """Create one pin under the shared rate limiter and report its outcome"""
+        with correlation_id(product['url'].split('?')[0]):
+            waited = self.pin_limiter.acquire()
+            started = time.monotonic()
+            ok = self.create_pinterest_pin(product, board_id)
+            latency = time.monotonic() - started
+            if ok:
+                logging.info(f"✅ Pinned: {product['title'][:40]}... ({latency:.2f}s)")
+            else:
+                logging.error(f"❌ Failed: {product['title'][:40]}... ({latency:.2f}s)")
+        return {'title': product['title'], 'ok': ok, 'latency': latency, 'waited': waited}
+
+    def run_daemon(self):
+        """Keep the bot and its sessions alive and run at BOT_RUN_TIMES each day"""
+        scheduler = Scheduler()
+
+        def configure():
+            scheduler.clear()
+            scheduler.every_day_at(parse_times(os.getenv('BOT_RUN_TIMES', '00:00,06:00,12:00,18:00')), 'bot', self.run)
+
+        configure()
+        scheduler.on_reload = configure
+        scheduler.install_signal_handlers()
+        scheduler.run_forever()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Amazon to Pinterest bot")
+    parser.add_argument('--daemon', action='store_true', help="stay resident and run on an internal schedule")
+    args = parser.parse_args()
+
+    setup_logging("bot.log")
     bot = AmazonPinterestBot()
-    bot.run()
+    if args.daemon:
+        bot.run_daemon()
+    else:
+        bot.run()
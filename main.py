@@ -1,94 +1,397 @@
 import os
 import logging
 import json
+import openai
 from dotenv import load_dotenv
 from scripts.amazon_scrapper import AmazonScraper
 from scripts.image_generator import ImageGenerator
-from scripts.pinterest_poster import PinterestPoster
+from scripts.pinterest_poster import PinterestPoster, DuplicateImageSkipped
 import time
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("automation.log"),
-        logging.StreamHandler()
-    ]
-)
+import socket
+import argparse
+from scripts.job_queue import JobQueue, LeaseHeartbeat
+from scripts.run_budget import RunBudget
+from scripts.http_transport import get_transport
+from scripts.preflight import run_preflight, pipeline_checks
+from scripts.scheduler import Scheduler, parse_times
+from scripts.image_cache import ImageCache
+from scripts.log_setup import setup_logging, correlation_id
+from scripts.seo_batch import SeoBatch
+from scripts.variant_renderer import FORMATS
+
+def process_product(product, image_generator, pinterest_poster, budget=None, use_openai=True, lease=None) -> bool:
+    """Generate SEO content and an image for one product and post it to Pinterest.
+
+    With a lease (a queued job), posting only happens if the lease is still held.
+    Raises DuplicateImageSkipped when the image was already pinned.
+    """
+    # Same ID for a product across runs and workers, so its log lines can be joined up
+    with correlation_id(JobQueue.job_key(product)[:12]):
+        return _process_product(product, image_generator, pinterest_poster, budget, use_openai, lease)
+
+def _process_product(product, image_generator, pinterest_poster, budget, use_openai, lease) -> bool:
+    # Pick cheaper paths as the run budget runs down or when OpenAI failed preflight
+    level = budget.level() if budget else RunBudget.NORMAL
+    allow_live_seo = use_openai and level in (RunBudget.NORMAL, RunBudget.DEGRADED) and (not budget or budget.can_afford(ImageGenerator.SEO_COST))
+    allow_paid_image = use_openai and level == RunBudget.NORMAL and (not budget or budget.can_afford(ImageGenerator.DALLE_COST))
+    pause = 2 if level == RunBudget.NORMAL else 0
+
+    # Generate SEO content
+    seo_content = image_generator.generate_seo_content(product, allow_live=allow_live_seo)
+    time.sleep(pause)
+
+    # Several pin formats rendered in memory from one base image, e.g. PIN_VARIANTS=pin,square
+    variant_formats = [f.strip() for f in os.environ.get('PIN_VARIANTS', '').split(',') if f.strip() in FORMATS]
+    if variant_formats:
+        variants, image_hash = image_generator.generate_product_variants(product, variant_formats, allow_paid=allow_paid_image)
+        time.sleep(pause)
+        if not variants:
+            logging.error(f"Failed to render image variants for product: {product['title']}")
+            return False
+        # Another worker takes the job over once the lease lapses, so only one of us may post it
+        if lease is not None and not lease.confirm():
+            return False
+        return pinterest_poster.post_to_pinterest(variants, product, seo_content, image_hash)
+
+    # Generate image
+    image_path, image_hash = image_generator.generate_product_image(product, allow_paid=allow_paid_image)
+    time.sleep(pause)
+
+    if not image_path:
+        logging.error(f"Failed to generate image for product: {product['title']}")
+        return False
+
+    try:
+        # Post to Pinterest, unless another worker has taken the job over
+        if lease is not None and not lease.confirm():
+            success = False
+        else:
+            success = pinterest_poster.post_to_pinterest(image_path, product, seo_content, image_hash)
+    finally:
+        # Clean up temporary image file
+        try:
+            os.remove(image_path)
+        except Exception as e:
+            logging.warning(f"Failed to remove temporary image file {image_path}: {e}")
+
+    return success
+
+def check_environment() -> bool:
+    # Load environment variables
+    load_dotenv()
+
+    # Check if required environment variables are set
+    required_vars = ['OPENAI_API_KEY', 'PINTEREST_ACCESS_TOKEN']
+    missing_vars = [var for var in required_vars if not os.environ.get(var)]
+    board_vars = ['PINTEREST_BOARD_ID', 'PINTEREST_BOARD_IDS', 'PINTEREST_BOARDS_FILE']
+    if not any(os.environ.get(var) for var in board_vars):
+        missing_vars.append(' or '.join(board_vars))
+
+    if missing_vars:
+        logging.error("Missing required environment variables: %s", ', '.join(missing_vars))
+        logging.info("Please set them in a .env file or in your GitHub repository secrets.")
+        return False
+    return True
+
+def scrape_products(scraper):
+    logging.info("Starting Amazon bestseller scraping...")
+    products = scraper.scrape_bestsellers()
+
+    if not products or len(products) == 0:
+        logging.error("No products scraped from Amazon")
+        return []
+
+    logging.info(f"Successfully scraped {len(products)} products from Amazon")
+    # Take top 5 products (or fewer if less than 5 were scraped)
+    return products[:5]
+
+def check_stages():
+    """Run (or reuse cached) preflight checks and return the health of each pipeline stage"""
+    report = run_preflight(pipeline_checks())
+    for name, result in report['checks'].items():
+        if not result['ok']:
+            logging.warning(f"Preflight check '{name}' failed: {result['detail']}")
+    return report['stages']
 
 def main() -> None:
     try:
-        # Load environment variables
-        load_dotenv()
-        
-        # Check if required environment variables are set
-        required_vars = ['OPENAI_API_KEY', 'PINTEREST_ACCESS_TOKEN', 'PINTEREST_BOARD_ID']
-        missing_vars = [var for var in required_vars if not os.environ.get(var)]
-        
-        if missing_vars:
-            logging.error("Missing required environment variables: %s", ', '.join(missing_vars))
-            logging.info("Please set them in a .env file or in your GitHub repository secrets.")
+        if not check_environment():
             return
         
+        stages = check_stages()
+        use_openai = stages.get('seo', True)
+        if not use_openai:
+            logging.warning("OpenAI failed preflight, using template SEO and local or fallback images")
+        
         # Initialize components
+        budget = RunBudget()
         scraper = AmazonScraper()
-        image_generator = ImageGenerator()
+        image_generator = ImageGenerator(budget=budget)
         pinterest_poster = PinterestPoster()
+        queue = JobQueue()
         
         # 1. Scrape Amazon bestsellers
-        logging.info("Starting Amazon bestseller scraping...")
-        products = scraper.scrape_bestsellers()
+        top_products = scrape_products(scraper)
         
-        if not products or len(products) == 0:
-            logging.error("No products scraped from Amazon. Aborting.")
+        if not stages.get('post', True):
+            logging.error("Pinterest API failed preflight, saving products to the job queue for a later run")
+            if top_products:
+                queue.enqueue(top_products)
             return
-            
-        logging.info(f"Successfully scraped {len(products)} products from Amazon")
-        
-        # Take top 5 products (or fewer if less than 5 were scraped)
-        top_products = products[:5]
         
         # Track successful pins
+        processed = []
         successful_pins = 0
+        skipped_pins = 0
         
-        # 2 & 3. For each product, generate image and post to Pinterest
-        for product in top_products:
+        # 2. Products left over from earlier runs go first
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-main"
+        for _ in range(int(os.environ.get('BACKLOG_PER_RUN', '5'))):
+            if budget.level() == RunBudget.EXHAUSTED:
+                break
+            job = queue.lease(worker_id)
+            if job is None:
+                break
+            processed.append(job['product'])
             try:
-                # Generate SEO content
-                seo_content = image_generator.generate_seo_content(product)
-                time.sleep(2) 
-                
-                # Generate image
-                image_path = image_generator.generate_product_image(product)
-                time.sleep(2) 
-                
-                if not image_path:
-                    logging.error(f"Failed to generate image for product: {product['title']}")
-                    continue
-                
-                # Post to Pinterest
-                success = pinterest_poster.post_to_pinterest(image_path, product, seo_content)
-                
-                if success:
+                if process_job(queue, job, worker_id, image_generator, pinterest_poster, budget, use_openai):
+                    successful_pins += 1
+            except DuplicateImageSkipped as e:
+                skipped_pins += 1
+                logging.info(f"Skipped product {job['product']['title']}: {e}")
+        
+        # 3. For each fresh product, generate image and post to Pinterest
+        done_keys = {JobQueue.job_key(product) for product in processed}
+        top_products = [product for product in top_products if JobQueue.job_key(product) not in done_keys]
+        for index, product in enumerate(top_products):
+            if budget.level() == RunBudget.EXHAUSTED:
+                # Save what we could not reach so the next run or a worker picks it up
+                remaining = top_products[index:]
+                logging.warning(f"Run budget exhausted, saving {len(remaining)} products for later: {budget.summary()}")
+                queue.enqueue(remaining)
+                break
+
+            processed.append(product)
+            started = time.monotonic()
+            try:
+                if process_product(product, image_generator, pinterest_poster, budget, use_openai):
                     successful_pins += 1
                     
-                # Clean up temporary image file
-                try:
-                    os.remove(image_path)
-                except Exception as e:
-                    logging.warning(f"Failed to remove temporary image file {image_path}: {e}")
-                    
+            except DuplicateImageSkipped as e:
+                skipped_pins += 1
+                logging.info(f"Skipped product {product['title']}: {e}")
             except Exception as e:
                 logging.error(f"Error processing product {product['title']}: {e}")
-                continue
+            budget.record_item(time.monotonic() - started)
+        
+        if not processed:
+            logging.error("No queued or scraped products to post. Aborting.")
+            return
         
         # Log daily activity
-        pinterest_poster.log_daily_activity(top_products, successful_pins)
+        pinterest_poster.log_daily_activity(processed, successful_pins, skipped_pins)
         
-        logging.info(f"Automation completed: {successful_pins}/{len(top_products)} products successfully posted to Pinterest")
+        logging.info(f"Automation completed: {successful_pins}/{len(processed)} products successfully posted to Pinterest, {skipped_pins} skipped as duplicates, budget: {budget.summary()}")
         
     except Exception as e:
         logging.error(f"Automation failed with error: {e}")
+    finally:
+        get_transport().log_stats()
+
+def enqueue_products(urgent=False) -> None:
+    """Scrape bestsellers and add them to the shared job queue for workers"""
+    try:
+        load_dotenv()
+        products = scrape_products(AmazonScraper())
+        if products:
+            if urgent:
+                # Urgent products get live SEO calls even with SEO_MODE=batch
+                products = [dict(product, urgent=True) for product in products]
+            JobQueue().enqueue(products)
+    except Exception as e:
+        logging.error(f"Enqueue failed with error: {e}")
+
+def process_job(queue, job, worker_id, image_generator, pinterest_poster, budget, use_openai=True) -> bool:
+    """Process a leased job while heartbeating its lease, then mark it finished.
+
+    A skipped duplicate is finished as done and DuplicateImageSkipped re-raised.
+    """
+    product = job['product']
+    success = False
+    skipped = None
+    started = time.monotonic()
+    try:
+        with LeaseHeartbeat(queue, job['id'], worker_id) as lease:
+            success = process_product(product, image_generator, pinterest_poster, budget, use_openai, lease)
+    except DuplicateImageSkipped as e:
+        # Done on purpose: a retry would pay for SEO and the image again only to be skipped again
+        skipped = e
+        success = True
+    except Exception as e:
+        logging.error(f"Error processing product {product['title']}: {e}")
+    budget.record_item(time.monotonic() - started)
+
+    if not queue.finish(job['id'], worker_id, success):
+        logging.warning(f"Job {job['id']} was no longer leased by {worker_id}, its result was not recorded")
+    if skipped is not None:
+        raise skipped
+    return success
+
+def run_daemon() -> None:
+    """Stay resident and spread scraping and posting over the day.
+
+    Connection pools, the image cache, glyph metrics and the perceptual-hash
+    index stay warm between slots. SIGHUP reloads .env and the schedule,
+    SIGTERM finishes the current pin and exits.
+    """
+    if not check_environment():
+        return
+
+    queue = JobQueue()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-daemon"
+    scraper = AmazonScraper()
+    image_cache = ImageCache()
+    components = {}
+    scheduler = Scheduler()
+
+    def scrape_slot():
+        products = scrape_products(scraper)
+        if products:
+            queue.enqueue(products)
+
+    def post_slot():
+        stages = check_stages()
+        if not stages.get('post', True):
+            logging.error("Pinterest API failed preflight, skipping this posting slot")
+            return
+
+        budget = RunBudget()
+        image_generator = components['image_generator']
+        image_generator.budget = budget
+        processed = []
+        successful_pins = 0
+        skipped_pins = 0
+        for _ in range(components['pins_per_slot']):
+            if scheduler.stop_event.is_set() or budget.level() == RunBudget.EXHAUSTED:
+                break
+            job = queue.lease(worker_id)
+            if job is None:
+                logging.info("No queued products to post in this slot")
+                break
+            processed.append(job['product'])
+            try:
+                if process_job(queue, job, worker_id, image_generator, components['pinterest_poster'], budget, stages.get('seo', True)):
+                    successful_pins += 1
+            except DuplicateImageSkipped as e:
+                skipped_pins += 1
+                logging.info(f"Skipped product {job['product']['title']}: {e}")
+
+        if processed:
+            components['pinterest_poster'].log_daily_activity(processed, successful_pins, skipped_pins)
+        logging.info(f"Posting slot finished: {successful_pins}/{len(processed)} products posted, {skipped_pins} skipped as duplicates, queue: {queue.counts()}")
+        get_transport().log_stats()
+
+    def configure():
+        load_dotenv(override=True)
+        components['image_generator'] = ImageGenerator(image_cache=image_cache)
+        components['pinterest_poster'] = PinterestPoster()
+        components['pins_per_slot'] = int(os.environ.get('DAEMON_PINS_PER_SLOT', '1'))
+        scheduler.clear()
+        scheduler.every_day_at(parse_times(os.environ.get('DAEMON_SCRAPE_TIMES', '06:00,14:00')), 'scrape', scrape_slot)
+        scheduler.every_day_at(parse_times(os.environ.get('DAEMON_POST_TIMES', '08:00,10:00,12:00,15:00,18:00,21:00')), 'post', post_slot)
+
+    configure()
+    scheduler.on_reload = configure
+    scheduler.install_signal_handlers()
+    logging.info(f"Daemon {worker_id} started")
+    scheduler.run_forever()
+    get_transport().log_stats()
+
+def run_seo_batch(action) -> None:
+    """Submit queued products for batch SEO generation, or collect a finished batch into the cache"""
+    try:
+        load_dotenv()
+        openai.api_key = os.environ.get('OPENAI_API_KEY')
+        seo_batch = SeoBatch()
+        if action == 'submit':
+            seo_batch.submit(JobQueue().pending_products(), ImageGenerator.seo_request_body)
+        else:
+            seo_batch.collect(timeout=float(os.environ.get('SEO_BATCH_POLL_TIMEOUT', '0')))
+    except Exception as e:
+        logging.error(f"SEO batch {action} failed with error: {e}")
+
+def run_worker(poll_interval=5) -> None:
+    """Drain the shared job queue; several workers can run against the same database"""
+    try:
+        if not check_environment():
+            return
+
+        stages = check_stages()
+        if not stages.get('post', True):
+            logging.error("Pinterest API failed preflight, leaving jobs queued")
+            return
+        use_openai = stages.get('seo', True)
+
+        queue = JobQueue()
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        budget = RunBudget()
+        image_generator = ImageGenerator(budget=budget)
+        pinterest_poster = PinterestPoster()
+        processed = []
+        successful_pins = 0
+        skipped_pins = 0
+
+        logging.info(f"Worker {worker_id} started on {queue.db_path}")
+        while True:
+            # Jobs that are not leased stay in the queue for the next run
+            if budget.level() == RunBudget.EXHAUSTED:
+                logging.warning(f"Run budget exhausted, leaving remaining jobs queued: {budget.summary()}")
+                break
+
+            job = queue.lease(worker_id)
+            if job is None:
+                # Other workers may still hold leases that could expire and come back
+                if not queue.has_live_work():
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            processed.append(job['product'])
+            try:
+                if process_job(queue, job, worker_id, image_generator, pinterest_poster, budget, use_openai):
+                    successful_pins += 1
+            except DuplicateImageSkipped as e:
+                skipped_pins += 1
+                logging.info(f"Skipped product {job['product']['title']}: {e}")
+
+        if processed:
+            pinterest_poster.log_daily_activity(processed, successful_pins, skipped_pins)
+        logging.info(f"Worker {worker_id} finished: {successful_pins}/{len(processed)} products posted, {skipped_pins} skipped as duplicates, queue: {queue.counts()}")
+
+    except Exception as e:
+        logging.error(f"Worker failed with error: {e}")
+    finally:
+        get_transport().log_stats()
 
 if __name__ == "__main__":
-    main()
+    # Set up logging
+    setup_logging("automation.log")
+
+    parser = argparse.ArgumentParser(description="Amazon to Pinterest automation")
+    parser.add_argument('--enqueue', action='store_true', help="scrape products into the shared job queue and exit")
+    parser.add_argument('--urgent', action='store_true', help="with --enqueue, mark the products urgent so they skip batch SEO")
+    parser.add_argument('--worker', action='store_true', help="process jobs from the shared job queue")
+    parser.add_argument('--daemon', action='store_true', help="stay resident and scrape and post on an internal schedule")
+    parser.add_argument('--seo-batch', choices=['submit', 'collect'], help="submit queued products for batch SEO generation, or collect the results")
+    args = parser.parse_args()
+
+    if args.seo_batch:
+        run_seo_batch(args.seo_batch)
+    elif args.enqueue:
+        enqueue_products(urgent=args.urgent)
+    elif args.worker:
+        run_worker()
+    elif args.daemon:
+        run_daemon()
+    else:
+        main()
@@ -1,13 +1,15 @@
 import requests
+from scripts.http_transport import get_transport
 from bs4 import BeautifulSoup
 import time
 import random
 import logging
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 class AmazonScraper:
-    def __init__(self):
+    def __init__(self, transport=None):
+        self.transport = transport or get_transport()
+        # get_with_retries is the only retry layer for Amazon, stacked retries would multiply the requests
+        self.transport.set_host_retries('https://www.amazon.com', 0)
         self.user_agents = [
             # Rotate through different common browsers
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -36,7 +38,7 @@ class AmazonScraper:
         for attempt in range(retries):
             try:
                 headers = self.get_random_headers()
-                response = requests.get(url, headers=headers, timeout=10)
+                response = self.transport.get(url, headers=headers, timeout=10)
                 if response.status_code == 429:
                     logging.warning(f"Rate limited (429). Retrying in {backoff_factor ** attempt}s...")
                     time.sleep(backoff_factor ** attempt)
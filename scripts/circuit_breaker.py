@@ -0,0 +1,115 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing endpoint until a half-open probe succeeds.
+
+    The circuit opens after failure_threshold consecutive failures, where a
+    call slower than slow_call_seconds counts as a failure even if it
+    returned. While open, calls fail fast with CircuitOpenError. After
+    recovery_seconds a single probe call is let through; its result closes
+    the circuit again or re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=3, recovery_seconds=60, slow_call_seconds=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_seconds:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                logging.info(f"Circuit '{self.name}' half-open, sending probe")
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                logging.info(f"Circuit '{self.name}' closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logging.warning(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probe_in_flight = False
+
+    def call(self, func, *args, **kwargs):
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+
+        if self.slow_call_seconds and time.monotonic() - started > self.slow_call_seconds:
+            logging.warning(f"Slow call on '{self.name}': {time.monotonic() - started:.1f}s")
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='hedge')
+
+
+def hedged_call(func, hedge_after=None, *args, on_hedge=None, **kwargs):
+    """Call func, starting one duplicate request if the first is slower than hedge_after.
+
+    Whichever attempt finishes successfully first wins. Hedging is skipped when
+    hedge_after is None. on_hedge is called when the duplicate is sent, so the
+    caller can account for the extra request.
+    """
+    if not hedge_after:
+        return func(*args, **kwargs)
+
+    futures = [_hedge_executor.submit(func, *args, **kwargs)]
+    done, _ = wait(futures, timeout=hedge_after)
+    if not done:
+        logging.info(f"No response after {hedge_after}s, sending hedged request")
+        futures.append(_hedge_executor.submit(func, *args, **kwargs))
+        if on_hedge is not None:
+            on_hedge()
+
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
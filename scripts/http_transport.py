@@ -0,0 +1,162 @@
+import os
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ResponseTooLarge(Exception):
+    """Raised when a streamed body exceeds the caller's size limit"""
+
+
+class TransportSession(requests.Session):
+    """requests.Session with default timeouts and per-host stats"""
+
+    def __init__(self, transport, host):
+        super().__init__()
+        self.transport = transport
+        self.host = host
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.transport.timeout)
+        response = super().request(method, url, **kwargs)
+        self.transport.record(self, response, streamed=kwargs.get('stream', False))
+        # High-volume event: lazy %-formatting so it costs nothing unless DEBUG is on and sampled in
+        logging.debug("HTTP %s %s -> %s in %.3fs", method, url, response.status_code, response.elapsed.total_seconds())
+        return response
+
+
+class HttpTransport:
+    """Pooled HTTP sessions shared by the scraper, generator and posters.
+
+    Each host gets its own session and connection pool, so cookies stay per
+    host and keep-alive connections are reused across components. All
+    sessions share the same timeouts and retry policy.
+    """
+
+    def __init__(self, connect_timeout=None, read_timeout=None, pool_size=None, retries=None, backoff_factor=1):
+        connect_timeout = connect_timeout or float(os.environ.get('HTTP_CONNECT_TIMEOUT', '5'))
+        read_timeout = read_timeout or float(os.environ.get('HTTP_READ_TIMEOUT', '30'))
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size or int(os.environ.get('HTTP_POOL_SIZE', '10'))
+        retries = retries if retries is not None else int(os.environ.get('HTTP_RETRIES', '3'))
+        # POST is left out of allowed_methods so pin creation is never sent twice.
+        # 429 is not retried here: the scrapers back off on it themselves and would multiply the attempts
+        self.retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD', 'PUT', 'OPTIONS']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.sessions = {}
+        self.host_stats = {}
+        self.lock = threading.Lock()
+
+    def session_for(self, url):
+        """Return the shared session for the URL's scheme and host"""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                session = TransportSession(self, host)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=self.retry)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self.sessions[host] = session
+                self.host_stats[host] = {'requests': 0, 'bytes': 0, 'latency': 0.0, 'errors': 0}
+            return session
+
+    def set_host_retries(self, url, retries):
+        """Override the retry count for one host, e.g. 0 where the caller runs its own retry loop"""
+        session = self.session_for(url)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=self.retry.new(total=retries))
+        with self.lock:
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        return self.session_for(url).request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def download(self, url, max_bytes, chunk_size=64 * 1024, **kwargs):
+        """Stream a body into memory, raising ResponseTooLarge past max_bytes"""
+        session = self.session_for(url)
+        with session.request('GET', url, stream=True, **kwargs) as response:
+            response.raise_for_status()
+            declared = int(response.headers.get('Content-Length') or 0)
+            if declared > max_bytes:
+                raise ResponseTooLarge(f"{url} is {declared} bytes, limit is {max_bytes}")
+
+            chunks = []
+            received = 0
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise ResponseTooLarge(f"{url} exceeded {max_bytes} bytes")
+                chunks.append(chunk)
+
+        with self.lock:
+            self.host_stats[session.host]['bytes'] += received
+        return b''.join(chunks)
+
+    def record(self, session, response, streamed=False):
+        with self.lock:
+            stats = self.host_stats[session.host]
+            stats['requests'] += 1
+            stats['latency'] += response.elapsed.total_seconds()
+            if response.status_code >= 400:
+                stats['errors'] += 1
+            if not streamed:
+                stats['bytes'] += len(response.content)
+
+    def stats(self):
+        """Per-host request counts, connections opened vs reused, bytes and latency"""
+        report = {}
+        with self.lock:
+            for host, session in self.sessions.items():
+                stats = self.host_stats[host]
+                opened = 0
+                adapter = session.get_adapter(host)
+                for key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is not None:
+                        opened += pool.num_connections
+                report[host] = {
+                    'requests': stats['requests'],
+                    'connections_opened': opened,
+                    'connections_reused': max(0, stats['requests'] - opened),
+                    'bytes': stats['bytes'],
+                    'errors': stats['errors'],
+                    'avg_latency': round(stats['latency'] / stats['requests'], 3) if stats['requests'] else 0.0
+                }
+        return report
+
+    def log_stats(self):
+        for host, stats in self.stats().items():
+            logging.info(f"HTTP {host}: {stats}")
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Process-wide shared transport"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HttpTransport()
+        return _transport
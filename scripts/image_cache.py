@@ -0,0 +1,137 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import closing
+from scripts.http_transport import get_transport
+
+
+class ImageCache:
+    """Content-addressed on-disk cache for downloaded product images.
+
+    Blobs are stored under the SHA-256 of their bytes, so the same picture
+    served from several URLs is kept once. A small SQLite index maps source
+    URLs to digests and is safe to share between worker processes. When the
+    cache grows past max_bytes the least recently used blobs are evicted.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, max_image_bytes=None, timeout=None, transport=None):
+        self.cache_dir = cache_dir or os.environ.get('IMAGE_CACHE_DIR', os.path.join('cache', 'images'))
+        self.max_bytes = max_bytes or int(os.environ.get('IMAGE_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+        self.max_image_bytes = max_image_bytes or int(os.environ.get('IMAGE_MAX_DOWNLOAD_BYTES', str(10 * 1024 * 1024)))
+        self.timeout = timeout
+        self.transport = transport or get_transport()
+        self.db_path = os.path.join(self.cache_dir, 'index.db')
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS images (url TEXT PRIMARY KEY, digest TEXT NOT NULL, updated REAL NOT NULL)')
+        # Walk the blobs once; after that the total is tracked as blobs are written
+        self.total_bytes = sum(size for _, size, _, _ in self.scan())
+
+    def connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def blob_path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def get(self, url):
+        """Return cached bytes for a URL, or None on a miss"""
+        with closing(self.connect()) as conn:
+            row = conn.execute('SELECT digest FROM images WHERE url = ?', (url,)).fetchone()
+        if not row:
+            return None
+
+        path = self.blob_path(row[0])
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Touch the blob so eviction sees it as recently used
+            os.utime(path, None)
+            return data
+        except OSError:
+            # Evicted, possibly by another process
+            with closing(self.connect()) as conn:
+                conn.execute('DELETE FROM images WHERE url = ?', (url,))
+            return None
+
+    def put(self, url, data):
+        """Store bytes for a URL and return their digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self.lock:
+                self.total_bytes += len(data)
+
+        with closing(self.connect()) as conn:
+            conn.execute('INSERT OR REPLACE INTO images (url, digest, updated) VALUES (?, ?, ?)', (url, digest, time.time()))
+
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        return digest
+
+    def scan(self):
+        """(mtime, size, digest, path) for every blob on disk"""
+        blobs = []
+        for root, _, files in os.walk(self.cache_dir):
+            if root == self.cache_dir:
+                continue
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, name, path))
+        return blobs
+
+    def evict(self):
+        """Remove least recently used blobs until the cache fits in max_bytes"""
+        # Rescan rather than trust the tracked total, other processes write here too
+        blobs = self.scan()
+        total = sum(size for _, size, _, _ in blobs)
+
+        evicted = []
+        for _, size, digest, path in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted.append(digest)
+            except OSError:
+                continue
+
+        with self.lock:
+            self.total_bytes = total
+        if evicted:
+            with closing(self.connect()) as conn:
+                conn.executemany('DELETE FROM images WHERE digest = ?', [(digest,) for digest in evicted])
+            logging.info(f"Evicted {len(evicted)} images from cache {self.cache_dir}")
+
+    def download(self, url):
+        """Stream a URL into memory through the shared transport, capped at max_image_bytes"""
+        kwargs = {'timeout': self.timeout} if self.timeout else {}
+        return self.transport.download(url, self.max_image_bytes, **kwargs)
+
+    def fetch(self, url):
+        """Return image bytes for a URL, downloading and caching on a miss"""
+        data = self.get(url)
+        if data is not None:
+            logging.info(f"Image cache hit: {url}")
+            return data
+
+        data = self.download(url)
+        self.put(url, data)
+        return data
@@ -1,45 +1,139 @@
 import os
+import time
 import openai
-import requests
 import logging
 import base64
 import json
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import io
-import textwrap
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from scripts.image_cache import ImageCache
+from scripts.phash_index import dhash
+from scripts.circuit_breaker import CircuitBreaker, hedged_call
+from scripts.http_transport import get_transport
+from scripts.text_layout import get_layout_engine
+from scripts.seo_batch import SeoBatch, SeoCache, seo_custom_id
+from scripts.variant_renderer import VariantRenderer
 
 class ImageGenerator:
-    def __init__(self, api_key=None):
+    RENDER_MODES = ('dalle', 'local', 'auto')
+    # Approximate USD cost of each OpenAI call, charged against the run budget
+    DALLE_COST = 0.04
+    SEO_COST = 0.01
+
+    def __init__(self, api_key=None, render_mode=None, image_cache=None, budget=None):
         self.api_key = api_key or os.environ.get('OPENAI_API_KEY')
         openai.api_key = self.api_key
-        
-    def generate_product_image(self, product_data):
-        """Generate an image for a product using DALL-E"""
+        self.render_mode = (render_mode or os.environ.get('IMAGE_RENDER_MODE', 'dalle')).lower()
+        if self.render_mode not in self.RENDER_MODES:
+            logging.warning(f"Unknown IMAGE_RENDER_MODE '{self.render_mode}', using 'dalle'")
+            self.render_mode = 'dalle'
+        # Categories that should still get a DALL-E scene when running in 'auto' mode
+        self.dalle_categories = {c.strip().lower() for c in os.environ.get('DALLE_CATEGORIES', '').split(',') if c.strip()}
+        self.image_cache = image_cache
+        self.budget = budget
+        self.layout = get_layout_engine()
+        self.variant_renderer = VariantRenderer(self.layout)
+        self._template = None
+        # 'batch': SEO comes from batch results, live calls only when needs_live_seo() says so
+        self.seo_mode = os.environ.get('SEO_MODE', 'live').lower()
+        self.seo_cache = SeoCache()
+        self.seo_batch = SeoBatch(self.seo_cache) if self.seo_mode == 'batch' else None
+        self.seo_batch_max_age = float(os.environ.get('SEO_BATCH_MAX_AGE_HOURS', '24')) * 3600
+
+        # Tight per-call deadlines; the breakers below handle retrying later.
+        # Set on this generator's own client, SeoBatch uploads and polling keep the SDK retries
+        self.max_retries = int(os.environ.get('OPENAI_MAX_RETRIES', '0'))
+        self._client = None
+        self.image_timeout = float(os.environ.get('OPENAI_IMAGE_TIMEOUT', '60'))
+        self.chat_timeout = float(os.environ.get('OPENAI_CHAT_TIMEOUT', '30'))
+        self.download_timeout = (5, float(os.environ.get('IMAGE_DOWNLOAD_TIMEOUT', '30')))
+        self.max_download_bytes = int(os.environ.get('IMAGE_MAX_DOWNLOAD_BYTES', str(10 * 1024 * 1024)))
+        hedge_after = os.environ.get('OPENAI_HEDGE_AFTER')
+        self.chat_hedge_after = float(hedge_after) if hedge_after else None
+
+        # One breaker per OpenAI endpoint; while open, work goes straight to the fallbacks
+        failure_threshold = int(os.environ.get('OPENAI_BREAKER_FAILURES', '3'))
+        recovery_seconds = float(os.environ.get('OPENAI_BREAKER_RECOVERY', '120'))
+        self.image_breaker = CircuitBreaker('openai.images', failure_threshold, recovery_seconds, slow_call_seconds=self.image_timeout * 0.75)
+        self.chat_breaker = CircuitBreaker('openai.chat', failure_threshold, recovery_seconds, slow_call_seconds=self.chat_timeout * 0.75)
+
+    def client(self):
+        """OpenAI client for live image and chat calls, created on first use"""
+        if self._client is None:
+            self._client = openai.OpenAI(api_key=self.api_key, max_retries=self.max_retries)
+        return self._client
+
+    def choose_render_mode(self, product_data):
+        """Decide whether a product is rendered with DALL-E or locally"""
+        if self.render_mode != 'auto':
+            return self.render_mode
+        if not product_data.get('image_url'):
+            return 'dalle'
+        if product_data.get('category', '').lower() in self.dalle_categories:
+            return 'dalle'
+        return 'local'
+
+    def generate_product_image(self, product_data, allow_paid=True):
+        """Generate an image for a product, routed to DALL-E or local mode by policy.
+
+        With allow_paid=False (run budget running low) DALL-E is never called:
+        the product photo is composited locally, or the text fallback is used.
+        Returns (image path, perceptual hash of the product photo or DALL-E
+        scene). The hash is None for the text-only fallback.
+        """
+        if self.choose_render_mode(product_data) == 'local' or not allow_paid:
+            image_path, image_hash = self.generate_local_image(product_data)
+            if image_path:
+                return image_path, image_hash
+            if not allow_paid:
+                return self.create_fallback_image(product_data), None
+            logging.warning("Local render failed, falling back to DALL-E")
+        return self.generate_dalle_image(product_data)
+
+    def generate_product_variants(self, product_data, formats=None, allow_paid=True):
+        """Render several pin formats from a single base image.
+
+        The base (local composite, DALL-E scene or a plain canvas as the last
+        resort) is generated and decoded once, then every format is laid out
+        from it. Returns ({format name: encoded PNG bytes}, perceptual hash of
+        the product photo or DALL-E scene, or None for the plain canvas).
+        """
+        base = None
+        image_hash = None
+        if product_data.get('image_url') and (self.choose_render_mode(product_data) == 'local' or not allow_paid):
+            try:
+                photo = self.product_photo(product_data)
+                base = self.local_base_image(product_data, photo)
+                image_hash = dhash(photo)
+            except Exception as e:
+                logging.error(f"Error rendering local image: {e}")
+        if base is None and allow_paid:
+            try:
+                base = self.dalle_base_image(product_data)
+                image_hash = dhash(base)
+            except Exception as e:
+                logging.error(f"Error generating image: {e}")
+        if base is None:
+            base = Image.new('RGB', (1024, 1024), color=(30, 30, 30))
+
         try:
-            logging.info(f"Generating image for product: {product_data['title']}")
-            
-            # Create a prompt for image generation
-            prompt = f"Create a professional, high-quality promotional image for an Amazon bestseller product: {product_data['title']}. Show the product in a clean, attractive setting that highlights its features. Include space for text and marketing elements. Style: modern, commercial, high-quality, product photography."
-            
-            # Generate image using DALL-E
-            response = openai.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1,
-            )
-            
-            image_url = response.data[0].url
-            
-            # Download the generated image
-            image_response = requests.get(image_url)
-            image_response.raise_for_status()
-            
-            # Enhance the image with product details
-            image = Image.open(io.BytesIO(image_response.content))
+            variants = self.variant_renderer.render(base, product_data, formats)
+            logging.info(f"Rendered {len(variants)} pin variants: {', '.join(variants)}")
+            return variants, image_hash
+        except Exception as e:
+            logging.error(f"Error rendering pin variants: {e}")
+            return {}, None
+
+    def charge(self, amount):
+        if self.budget is not None:
+            self.budget.charge(amount)
+
+    def generate_dalle_image(self, product_data):
+        """Generate an image for a product using DALL-E; returns (image path, hash of the scene)"""
+        try:
+            image = self.dalle_base_image(product_data)
+            # Hash the scene before the text goes on, the shared layout would make every pin look alike
+            image_hash = dhash(image)
             
             # Add product details to the image
             modified_image = self.add_product_details(image, product_data)
@@ -49,29 +143,94 @@ class ImageGenerator:
             modified_image.save(output_filename)
             
             logging.info(f"Successfully generated and saved image to {output_filename}")
-            return output_filename
+            return output_filename, image_hash
             
         except Exception as e:
             logging.error(f"Error generating image: {e}")
             # Create a fallback image with just text
-            return self.create_fallback_image(product_data)
+            return self.create_fallback_image(product_data), None
     
+    def dalle_base_image(self, product_data):
+        """Generate and decode a DALL-E scene for a product, without text"""
+        logging.info(f"Generating image for product: {product_data['title']}")
+        
+        # Create a prompt for image generation
+        prompt = f"Create a professional, high-quality promotional image for an Amazon bestseller product: {product_data['title']}. Show the product in a clean, attractive setting that highlights its features. Include space for text and marketing elements. Style: modern, commercial, high-quality, product photography."
+        
+        # Generate image using DALL-E
+        response = self.image_breaker.call(
+            self.client().images.generate,
+            model="dall-e-3",
+            prompt=prompt,
+            size="1024x1024",
+            quality="standard",
+            n=1,
+            timeout=self.image_timeout,
+        )
+        self.charge(self.DALLE_COST)
+        
+        image_url = response.data[0].url
+        
+        # Download the generated image
+        image_bytes = get_transport().download(image_url, self.max_download_bytes, timeout=self.download_timeout)
+        return Image.open(io.BytesIO(image_bytes))
+
+    def get_template(self):
+        """Branded 1024x1024 background shared by every local render"""
+        if self._template is None:
+            template = Image.new('RGB', (1024, 1024), color=(245, 242, 236))
+            draw = ImageDraw.Draw(template)
+            # Soft frame around the product area between the badge and the text band
+            draw.rectangle([(40, 110), (984, 694)], fill=(255, 255, 255), outline=(254, 189, 105), width=4)
+            self._template = template
+        return self._template
+
+    def product_photo(self, product_data):
+        """Scraped product photo, through the image cache"""
+        if self.image_cache is None:
+            self.image_cache = ImageCache()
+        return Image.open(io.BytesIO(self.image_cache.fetch(product_data['image_url']))).convert('RGBA')
+
+    def local_base_image(self, product_data, photo=None):
+        """Composite the scraped product photo onto the branded template, without text"""
+        logging.info(f"Rendering local image for product: {product_data['title']}")
+        if photo is None:
+            photo = self.product_photo(product_data)
+
+        image = self.get_template().copy()
+        # Fit the photo inside the frame, keeping its aspect ratio
+        photo.thumbnail((904, 544))
+        left = 512 - photo.width // 2
+        top = 402 - photo.height // 2
+        image.paste(photo, (left, top), photo)
+        return image
+
+    def generate_local_image(self, product_data):
+        """Composite the scraped product photo onto the branded template; returns (image path, hash of the photo)"""
+        try:
+            if not product_data.get('image_url'):
+                return None, None
+
+            photo = self.product_photo(product_data)
+            image = self.local_base_image(product_data, photo)
+            modified_image = self.add_product_details(image, product_data)
+
+            output_filename = f"local_image_{product_data['title'][:20].replace(' ', '_')}.png"
+            modified_image.save(output_filename)
+
+            logging.info(f"Successfully rendered local image to {output_filename}")
+            # The photo itself, since a small one leaves the frame and template to decide the hash
+            return output_filename, dhash(photo)
+
+        except Exception as e:
+            logging.error(f"Error rendering local image: {e}")
+            return None, None
+
     def add_product_details(self, image, product_data):
         """Add product details to the image"""
         try:
-            draw = ImageDraw.Draw(image)
             width, height = image.size
             
-            # Try to load a nice font, fall back to default if not available
-            try:
-                title_font = ImageFont.truetype("Arial.ttf", 40)
-                price_font = ImageFont.truetype("Arial.ttf", 50)
-                subtitle_font = ImageFont.truetype("Arial.ttf", 30)
-            except IOError:
-                title_font = ImageFont.load_default()
-                price_font = ImageFont.load_default()
-                subtitle_font = ImageFont.load_default()
-            
             # Add semi-transparent overlay for text readability
             overlay = Image.new('RGBA', image.size, (0, 0, 0, 0))
             overlay_draw = ImageDraw.Draw(overlay)
@@ -82,23 +241,17 @@ class ImageGenerator:
             badge_draw = ImageDraw.Draw(badge_overlay)
             badge_draw.rectangle([(0, 0), (width, 80)], fill=(254, 189, 105, 230))
             badge_text = f"AMAZON BESTSELLER - {product_data['category']}"
-            badge_draw.text((width//2, 40), badge_text, fill=(0, 0, 0), font=subtitle_font, anchor="mm")
+            self.layout.draw(badge_draw, badge_text, (20, 10, width - 20, 70), 30, 18, fill=(0, 0, 0), max_lines=1)
             
             # Composite the images
             image = Image.alpha_composite(image.convert('RGBA'), overlay)
             image = Image.alpha_composite(image, badge_overlay)
             
-            # Add product title - wrap text for better appearance
-            title = product_data['title']
-            wrapped_title = textwrap.fill(title, width=30)
+            # Fit title, price and call to action into fixed boxes inside the 300px band
             draw = ImageDraw.Draw(image)
-            draw.text((width//2, height - 200), wrapped_title, fill=(255, 255, 255), font=title_font, anchor="mm", align="center")
-            
-            # Add price with emphasis
-            draw.text((width//2, height - 100), product_data['price'], fill=(254, 189, 105), font=price_font, anchor="mm")
-            
-            # Add a call to action
-            draw.text((width//2, height - 50), "Check it out on Amazon", fill=(255, 255, 255), font=subtitle_font, anchor="mm")
+            self.layout.draw(draw, product_data['title'], (40, height - 290, width - 40, height - 135), 40, 22, fill=(255, 255, 255), max_lines=3)
+            self.layout.draw(draw, product_data['price'], (40, height - 135, width - 40, height - 70), 50, 28, fill=(254, 189, 105), max_lines=1)
+            self.layout.draw(draw, "Check it out on Amazon", (40, height - 70, width - 40, height - 20), 30, 18, fill=(255, 255, 255), max_lines=1)
             
             return image.convert('RGB')  # Convert back to RGB for saving as JPG
             
@@ -113,30 +266,15 @@ class ImageGenerator:
             image = Image.new('RGB', (1024, 1024), color=(30, 30, 30))
             draw = ImageDraw.Draw(image)
             
-            try:
-                title_font = ImageFont.truetype("Arial.ttf", 40)
-                price_font = ImageFont.truetype("Arial.ttf", 60)
-                subtitle_font = ImageFont.truetype("Arial.ttf", 30)
-            except IOError:
-                title_font = ImageFont.load_default()
-                price_font = ImageFont.load_default()
-                subtitle_font = ImageFont.load_default()
-            
             # Add Amazon bestseller badge
             draw.rectangle([(0, 0), (1024, 80)], fill=(254, 189, 105))
             badge_text = f"AMAZON BESTSELLER - {product_data['category']}"
-            draw.text((512, 40), badge_text, fill=(0, 0, 0), font=subtitle_font, anchor="mm")
-            
-            # Add product title - wrapped
-            title = product_data['title']
-            wrapped_title = textwrap.fill(title, width=30)
-            draw.text((512, 400), wrapped_title, fill=(255, 255, 255), font=title_font, anchor="mm", align="center")
+            self.layout.draw(draw, badge_text, (20, 10, 1004, 70), 30, 18, fill=(0, 0, 0), max_lines=1)
             
-            # Add price with emphasis
-            draw.text((512, 600), product_data['price'], fill=(254, 189, 105), font=price_font, anchor="mm")
-            
-            # Add a call to action
-            draw.text((512, 800), "Check it out on Amazon", fill=(255, 255, 255), font=subtitle_font, anchor="mm")
+            # Add product title, price and call to action, each fitted to its box
+            self.layout.draw(draw, product_data['title'], (60, 200, 964, 540), 48, 24, fill=(255, 255, 255), max_lines=5)
+            self.layout.draw(draw, product_data['price'], (60, 560, 964, 660), 60, 32, fill=(254, 189, 105), max_lines=1)
+            self.layout.draw(draw, "Check it out on Amazon", (60, 760, 964, 840), 30, 18, fill=(255, 255, 255), max_lines=1)
             
             # Save to a temporary file
             output_filename = f"fallback_image_{product_data['title'][:20].replace(' ', '_')}.png"
@@ -150,13 +288,10 @@ class ImageGenerator:
             # If all else fails, return None and the caller will need to handle this
             return None
             
-    def generate_seo_content(self, product_data):
-        """Generate SEO-optimized title and description for Pinterest"""
-        try:
-            logging.info(f"Generating SEO content for product: {product_data['title']}")
-            
-            # Generate SEO content using ChatGPT
-            prompt = f"""
+    @staticmethod
+    def seo_request_body(product_data):
+        """Chat completion request for a product's SEO content, shared by live and batch calls"""
+        prompt = f"""
             Create SEO-optimized Pinterest content for this Amazon bestseller product:
             
             Product: {product_data['title']}
@@ -170,17 +305,44 @@ class ImageGenerator:
             
             Format your response as JSON with keys: 'title', 'description', 'keywords'
             """
+        return {
+            'model': "gpt-4o",
+            'messages': [
+                {"role": "system", "content": "You are a professional e-commerce marketer specializing in Pinterest SEO."},
+                {"role": "user", "content": prompt}
+            ],
+            'temperature': 0.7,
+            'max_tokens': 1000
+        }
+
+    def generate_seo_content(self, product_data, allow_live=True):
+        """Generate SEO-optimized title and description for Pinterest"""
+        try:
+            cached = self.seo_cache.get(seo_custom_id(product_data))
+            if cached:
+                logging.info(f"Using batch SEO content for product: {product_data['title']}")
+                return cached
+        except Exception as e:
+            logging.warning(f"Error reading SEO cache: {e}")
+
+        if self.seo_mode == 'batch' and not self.needs_live_seo(product_data):
+            allow_live = False
+        if not allow_live:
+            return self.fallback_seo_content(product_data)
+
+        try:
+            logging.info(f"Generating SEO content for product: {product_data['title']}")
             
-            response = openai.chat.completions.create(
-                        model="gpt-4o",
-                        messages=[
-                            {"role": "system", "content": "You are a professional e-commerce marketer specializing in Pinterest SEO."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        temperature=0.7,
-                        max_tokens=1000
+            # Generate SEO content using ChatGPT
+            response = self.chat_breaker.call(
+                        hedged_call,
+                        self.client().chat.completions.create,
+                        self.chat_hedge_after,
+                        on_hedge=lambda: self.charge(self.SEO_COST),
+                        timeout=self.chat_timeout,
+                        **self.seo_request_body(product_data)
                     )
-
+            self.charge(self.SEO_COST)
             
             seo_content = json.loads(response.choices[0].message.content)
             logging.info("Successfully generated SEO content")
@@ -188,9 +350,24 @@ class ImageGenerator:
             
         except Exception as e:
             logging.error(f"Error generating SEO content: {e}")
-            # Provide fallback SEO content
-            return {
-                'title': f"Amazon Bestseller: {product_data['title'][:80]}",
-                'description': f"Check out this top-rated {product_data['category']} product on Amazon! Currently priced at {product_data['price']}. #AmazonBestseller #{product_data['category'].replace(' ', '')} #DealsAndSteals #MustHaveProducts",
-                'keywords': ['Amazon Bestseller', product_data['category'], 'Top Rated Products', 'Amazon Deals', 'Must Have Products']
-            }
+            return self.fallback_seo_content(product_data)
+
+    def needs_live_seo(self, product_data):
+        """In batch mode, whether an uncached product should still get a live SEO call.
+
+        True for products enqueued as urgent, and for every product once the
+        last batch is older than SEO_BATCH_MAX_AGE_HOURS (or none was ever
+        submitted), since no batch result is coming for it.
+        """
+        if product_data.get('urgent'):
+            return True
+        submitted = self.seo_batch.last_submitted()
+        return submitted is None or time.time() - submitted > self.seo_batch_max_age
+
+    def fallback_seo_content(self, product_data):
+        """Template SEO content used when the live call fails or is skipped"""
+        return {
+            'title': f"Amazon Bestseller: {product_data['title'][:80]}",
+            'description': f"Check out this top-rated {product_data['category']} product on Amazon! Currently priced at {product_data['price']}. #AmazonBestseller #{product_data['category'].replace(' ', '')} #DealsAndSteals #MustHaveProducts",
+            'keywords': ['Amazon Bestseller', product_data['category'], 'Top Rated Products', 'Amazon Deals', 'Must Have Products']
+        }
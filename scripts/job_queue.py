@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import closing
+
+
+class JobQueue:
+    """SQLite-backed product job queue shared by several worker processes.
+
+    Each job is held under a lease that the owning worker renews with
+    heartbeats. A lease that expires (crashed or stuck worker) makes the job
+    available again, and a finished job is never handed out a second time.
+    """
+
+    def __init__(self, db_path=None, lease_seconds=None, max_attempts=3):
+        self.db_path = db_path or os.environ.get('JOB_QUEUE_DB', os.path.join('cache', 'jobs.db'))
+        self.lease_seconds = lease_seconds or int(os.environ.get('JOB_LEASE_SECONDS', '300'))
+        self.max_attempts = max_attempts
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_key TEXT UNIQUE NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated REAL NOT NULL
+                )
+            """)
+
+    def connect(self):
+        # isolation_level=None so BEGIN IMMEDIATE below controls the write lock
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def job_key(product):
+        source = product.get('product_url') or product.get('title', '')
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def enqueue(self, products):
+        """Add products as pending jobs, ignoring ones already queued or done"""
+        added = 0
+        now = time.time()
+        with closing(self.connect()) as conn:
+            for product in products:
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO jobs (job_key, payload, updated) VALUES (?, ?, ?)',
+                    (self.job_key(product), json.dumps(product), now)
+                )
+                added += cursor.rowcount
+        logging.info(f"Enqueued {added}/{len(products)} new product jobs")
+        return added
+
+    def lease(self, worker_id):
+        """Atomically claim the next pending or expired job, or return None"""
+        now = time.time()
+        conn = self.connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # A lease that expired on the job's last attempt (crashed worker) is never handed out again
+            conn.execute(
+                """UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires = NULL, updated = ?
+                   WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""",
+                (now, now, self.max_attempts)
+            )
+            row = conn.execute(
+                """SELECT id, payload, attempts FROM jobs
+                   WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                     AND attempts < ?
+                   ORDER BY id LIMIT 1""",
+                (now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            conn.execute(
+                """UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                   attempts = attempts + 1, updated = ? WHERE id = ?""",
+                (worker_id, now + self.lease_seconds, now, row['id'])
+            )
+            conn.execute('COMMIT')
+            return {'id': row['id'], 'product': json.loads(row['payload']), 'attempts': row['attempts'] + 1}
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id, worker_id):
+        """Extend a lease; returns False if the worker no longer owns the job"""
+        now = time.time()
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                """UPDATE jobs SET lease_expires = ?, updated = ?
+                   WHERE id = ? AND lease_owner = ? AND status = 'leased'""",
+                (now + self.lease_seconds, now, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, job_id, worker_id, success):
+        """Mark a job done, or return it to the queue after a failure"""
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                """UPDATE jobs SET lease_owner = NULL, lease_expires = NULL, updated = ?,
+                   status = CASE WHEN ? THEN 'done' WHEN attempts >= ? THEN 'failed' ELSE 'pending' END
+                   WHERE id = ? AND lease_owner = ? AND status = 'leased'""",
+                (time.time(), 1 if success else 0, self.max_attempts, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def has_live_work(self):
+        """True while jobs are pending or leased; expired last attempts are failed by lease()"""
+        with closing(self.connect()) as conn:
+            row = conn.execute(
+                """SELECT COUNT(*) FROM jobs
+                   WHERE (status = 'pending' AND attempts < ?) OR status = 'leased'""",
+                (self.max_attempts,)
+            ).fetchone()
+            return row[0] > 0
+
+    def pending_products(self):
+        """Yield the products of jobs that have not been processed yet"""
+        with closing(self.connect()) as conn:
+            for row in conn.execute("SELECT payload FROM jobs WHERE status IN ('pending', 'leased') AND attempts < ? ORDER BY id", (self.max_attempts,)):
+                yield json.loads(row['payload'])
+
+    def counts(self):
+        with closing(self.connect()) as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+            return {status: count for status, count in rows}
+
+
+class LeaseHeartbeat:
+    """Background thread renewing a job lease while the job is processed"""
+
+    def __init__(self, queue, job_id, worker_id, interval=None):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval or max(1, queue.lease_seconds // 3)
+        self.stop_event = threading.Event()
+        self.lost = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker_id):
+                    logging.warning(f"Lost lease on job {self.job_id}")
+                    self.lost = True
+                    return
+            except Exception as e:
+                logging.warning(f"Heartbeat failed for job {self.job_id}: {e}")
+
+    def confirm(self):
+        """Renew the lease right now; False if it was lost or cannot be confirmed"""
+        if not self.lost:
+            try:
+                if self.queue.heartbeat(self.job_id, self.worker_id):
+                    return True
+                self.lost = True
+            except Exception as e:
+                logging.warning(f"Could not confirm lease on job {self.job_id}: {e}")
+        logging.warning(f"Lease on job {self.job_id} is no longer held by {self.worker_id}")
+        return False
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop_event.set()
+        self.thread.join()
@@ -0,0 +1,143 @@
+import io
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from PIL import Image
+
+
+def dhash(image, hash_size=8):
+    """Difference hash of an image (PIL image, path or encoded bytes) as a 64-bit integer"""
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image))
+    elif not isinstance(image, Image.Image):
+        image = Image.open(image)
+    # One extra column so each row yields hash_size left/right comparisons
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes using Hamming distance"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        node = [value, item, {}]
+        self.size += 1
+        if self.root is None:
+            self.root = node
+            return
+
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value, threshold):
+        """Return (distance, item) pairs within threshold, closest first"""
+        if self.root is None:
+            return []
+
+        matches = []
+        stack = [self.root]
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= threshold:
+                matches.append((distance, item))
+            # Triangle inequality: only subtrees in [d - t, d + t] can hold matches
+            for child_distance, child in children.items():
+                if distance - threshold <= child_distance <= distance + threshold:
+                    stack.append(child)
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class PHashIndex:
+    """Persistent perceptual-hash index of every image posted to Pinterest.
+
+    Hashes live in a SQLite table shared by every worker and daemon process.
+    Each process keeps an in-memory BK-tree and pulls in rows added by others
+    before every lookup, so a pin posted by one worker is seen by the rest.
+    """
+
+    def __init__(self, path=None, threshold=None):
+        self.path = path or os.environ.get('PHASH_INDEX_PATH', os.path.join('cache', 'phash_index.db'))
+        self.threshold = threshold if threshold is not None else int(os.environ.get('PHASH_THRESHOLD', '6'))
+        self.lock = threading.Lock()
+        self.tree = BKTree()
+        self.last_id = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS hashes (id INTEGER PRIMARY KEY AUTOINCREMENT, hash TEXT NOT NULL, entry TEXT NOT NULL)')
+            self.import_json(conn)
+        self.sync()
+        logging.info(f"Loaded {self.tree.size} perceptual hashes from {self.path}")
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def import_json(self, conn):
+        """One-off import of the JSON index used by earlier versions"""
+        legacy_path = os.path.splitext(self.path)[0] + '.json'
+        if not os.path.exists(legacy_path) or conn.execute('SELECT 1 FROM hashes LIMIT 1').fetchone():
+            return
+        try:
+            with open(legacy_path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not import {legacy_path}: {e}")
+            return
+        conn.execute('BEGIN')
+        conn.executemany('INSERT INTO hashes (hash, entry) VALUES (?, ?)', [(entry['hash'], json.dumps(entry)) for entry in entries])
+        conn.execute('COMMIT')
+        logging.info(f"Imported {len(entries)} perceptual hashes from {legacy_path}")
+
+    def sync(self):
+        """Add rows written since the last sync, by this or any other process, to the tree"""
+        with self.lock:
+            with closing(self.connect()) as conn:
+                rows = conn.execute('SELECT id, hash, entry FROM hashes WHERE id > ? ORDER BY id', (self.last_id,)).fetchall()
+            for row_id, image_hash, entry in rows:
+                self.tree.add(int(image_hash, 16), json.loads(entry))
+                self.last_id = row_id
+
+    def find(self, image_hash, threshold=None):
+        """Return the closest indexed entry within threshold, or None"""
+        threshold = self.threshold if threshold is None else threshold
+        self.sync()
+        with self.lock:
+            matches = self.tree.search(image_hash, threshold)
+        return matches[0][1] if matches else None
+
+    def add(self, image_hash, **metadata):
+        entry = dict(metadata, hash=f"{image_hash:016x}", added=int(time.time()))
+        with closing(self.connect()) as conn:
+            conn.execute('INSERT INTO hashes (hash, entry) VALUES (?, ?)', (entry['hash'], json.dumps(entry)))
+        self.sync()
+        return entry
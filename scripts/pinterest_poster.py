@@ -1,88 +1,192 @@
 import os
-import requests
 import logging
 import json
 import time
+import contextvars
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from scripts.phash_index import PHashIndex
+from scripts.http_transport import get_transport
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+class DuplicateImageSkipped(Exception):
+    """Raised when a product is deliberately not posted because its image was already pinned"""
 
 class PinterestPoster:
-    def __init__(self, access_token=None, board_id=None):
+    def __init__(self, access_token=None, board_id=None, boards=None, transport=None):
         self.access_token = access_token or os.environ.get('PINTEREST_ACCESS_TOKEN')
         self.board_id = board_id or os.environ.get('PINTEREST_BOARD_ID')
-        self.api_base_url = "https://api.pinterest.com/v5"
-        
-    def post_to_pinterest(self, image_path, product_data, seo_content):
-        """Post image to Pinterest with SEO content"""
+        # Point at a local stand-in with PINTEREST_API_BASE_URL when testing
+        self.api_base_url = os.environ.get('PINTEREST_API_BASE_URL', "https://api.pinterest.com/v5").rstrip('/')
+        self.transport = transport or get_transport()
+        self.headers = {
+            'Authorization': f'Bearer {self.access_token}'
+        }
+        self.boards = self.parse_boards(boards)
+        self.max_pin_workers = int(os.environ.get('PINTEREST_MAX_PIN_WORKERS', '4'))
+        # 'skip' drops near-duplicate images, 'reuse' pins them again from the earlier media ID
+        self.duplicate_action = os.environ.get('PHASH_DUPLICATE_ACTION', 'skip').lower()
+        self.phash_index = PHashIndex()
+
+    def parse_boards(self, boards=None):
+        """Normalise the target boards into a list of {'board_id': ..., overrides} dicts.
+
+        Boards can be passed as IDs or dicts with per-board copy overrides
+        ('title', 'description', 'link', 'alt_text'). Without an explicit list,
+        PINTEREST_BOARDS_FILE (JSON list), then PINTEREST_BOARD_IDS
+        (comma-separated), then the single board_id are used.
+        """
+        boards_file = os.environ.get('PINTEREST_BOARDS_FILE')
+        if boards is None and boards_file:
+            try:
+                with open(boards_file) as f:
+                    boards = json.load(f)
+            except Exception as e:
+                logging.error(f"Error loading boards file {boards_file}: {e}")
+
+        if boards is None:
+            env_boards = os.environ.get('PINTEREST_BOARD_IDS', '')
+            boards = [b.strip() for b in env_boards.split(',') if b.strip()]
+            if not boards and self.board_id:
+                boards = [self.board_id]
+
+        parsed = []
+        for board in boards:
+            if isinstance(board, dict):
+                if not board.get('board_id'):
+                    logging.warning(f"Ignoring board entry without board_id: {board}")
+                    continue
+                parsed.append(dict(board))
+            else:
+                parsed.append({'board_id': str(board)})
+
+        if parsed and not self.board_id:
+            self.board_id = parsed[0]['board_id']
+        return parsed
+
+    def post_to_pinterest(self, image_path, product_data, seo_content, image_hash=None):
+        """Post image to Pinterest with SEO content on every target board.
+
+        image_hash is the perceptual hash of the base image before any text was
+        drawn; without one the duplicate check is skipped.
+        """
         try:
             logging.info(f"Posting to Pinterest: {seo_content['title']}")
-            
-            # Endpoint for creating pins
-            url = f"{self.api_base_url}/pins"
-            
-            # Prepare the headers
-            headers = {
-                'Authorization': f'Bearer {self.access_token}'
-            }
-            
+
+            if not self.boards:
+                logging.error("No Pinterest boards configured")
+                return False
+
             # Create a link to the product on Amazon (if available)
-            destination_url = product_data.get('product_url', f"https://www.amazon.com/s?k={product_data['title'].replace(' ', '+')}")
-            
-            # First, upload the image to get a media ID
-            media_id = self.upload_image(image_path)
-            if not media_id:
-                logging.error("Failed to upload image to Pinterest")
+            destination_url = product_data.get('product_url') or f"https://www.amazon.com/s?k={product_data['title'].replace(' ', '+')}"
+
+            # A dict of rendered variants lets boards pick a format with a 'variant' key
+            variants = image_path if isinstance(image_path, dict) else {'default': image_path}
+            if not variants:
+                logging.error("No image to post")
                 return False
-                
-            # Prepare the data for creating a pin
-            data = {
+            default_variant = next(iter(variants))
+
+            # Look for a near-identical image that was already posted
+            duplicate = self.phash_index.find(image_hash) if image_hash is not None else None
+            media_ids = {}
+            if duplicate:
+                # Entries from before variants only hold the media ID of a single plain image
+                recorded = duplicate.get('media_ids') or ({'default': duplicate['media_id']} if duplicate.get('media_id') else {})
+                if self.duplicate_action != 'reuse' or not recorded:
+                    raise DuplicateImageSkipped(f"near-duplicate of already posted image: {duplicate.get('title')}")
+                # Only variants with recorded media are reused, the others are uploaded below
+                media_ids = {name: recorded[name] for name in variants if name in recorded}
+                logging.info(f"Reusing media {media_ids} of near-duplicate image: {duplicate.get('title')}")
+
+            # Upload and process each variant in use once, every board reuses its media ID
+            board_variants = [board.get('variant') if board.get('variant') in variants else default_variant for board in self.boards]
+            for name in dict.fromkeys(board_variants):
+                if name not in media_ids:
+                    media_ids[name] = self.upload_image(variants[name])
+                if not media_ids[name]:
+                    logging.error(f"Failed to upload image variant '{name}' to Pinterest")
+                    return False
+
+            pin_data = {
                 'title': seo_content['title'],
                 'description': seo_content['description'],
-                'board_id': self.board_id,
-                'media_source': {
-                    'media_id': media_id
-                },
                 'link': destination_url,
                 'alt_text': product_data['title']
             }
-            
-            # Make the API request
-            response = requests.post(url, headers=headers, json=data)
-            
-            # Check if the request was successful
-            if response.status_code == 201 or response.status_code == 200:
-                pin_data = response.json()
-                logging.info(f"Successfully posted to Pinterest. Pin ID: {pin_data.get('id')}")
-                return True
+
+            board_media = [media_ids[name] for name in board_variants]
+            if len(self.boards) == 1:
+                results = [self.create_pin(self.boards[0], board_media[0], pin_data)]
             else:
-                logging.error(f"Failed to post to Pinterest. Status code: {response.status_code}, Response: {response.text}")
-                return False
-                
+                workers = max(1, min(self.max_pin_workers, len(self.boards)))
+                # Carry the caller's context (log correlation ID) into the worker threads
+                contexts = [contextvars.copy_context() for _ in self.boards]
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(lambda ctx, board, media_id: ctx.run(self.create_pin, board, media_id, pin_data), contexts, self.boards, board_media))
+
+            created = sum(1 for pin_id in results if pin_id)
+            logging.info(f"Created {created}/{len(self.boards)} pins from {len(set(board_media))} uploaded images")
+            if created and not duplicate and image_hash is not None and media_ids.get(default_variant):
+                self.phash_index.add(image_hash, media_id=media_ids[default_variant], media_ids=media_ids, title=product_data['title'], product_url=product_data.get('product_url'))
+            return created > 0
+
+        except DuplicateImageSkipped:
+            raise
         except Exception as e:
             logging.error(f"Error posting to Pinterest: {e}")
             return False
-            
+
+    def create_pin(self, board, media_id, pin_data):
+        """Create a single pin on a board from an already uploaded media ID"""
+        try:
+            url = f"{self.api_base_url}/pins"
+
+            # Board-level overrides win over the shared product copy
+            data = {
+                'title': board.get('title') or pin_data['title'],
+                'description': board.get('description') or pin_data['description'],
+                'board_id': board['board_id'],
+                'media_source': {
+                    'media_id': media_id
+                },
+                'link': board.get('link') or pin_data['link'],
+                'alt_text': board.get('alt_text') or pin_data['alt_text']
+            }
+
+            response = self.transport.post(url, headers=self.headers, json=data)
+
+            if response.status_code == 201 or response.status_code == 200:
+                pin_id = response.json().get('id')
+                logging.info(f"Successfully posted to board {board['board_id']}. Pin ID: {pin_id}")
+                return pin_id or True
+            else:
+                logging.error(f"Failed to post to board {board['board_id']}. Status code: {response.status_code}, Response: {response.text}")
+                return None
+
+        except Exception as e:
+            logging.error(f"Error creating pin on board {board.get('board_id')}: {e}")
+            return None
+
     def upload_image(self, image_path):
-        """Upload image to Pinterest and get media ID"""
+        """Upload an image (file path or encoded bytes) to Pinterest and get media ID"""
         try:
             # First, get upload parameters from Pinterest
             url = f"{self.api_base_url}/media"
-            headers = {
-                'Authorization': f'Bearer {self.access_token}'
-            }
             
             # Read image and get its size
-            with open(image_path, 'rb') as img_file:
-                img_data = img_file.read()
-                img_size = len(img_data)
+            if isinstance(image_path, (bytes, bytearray)):
+                img_data = bytes(image_path)
+            else:
+                with open(image_path, 'rb') as img_file:
+                    img_data = img_file.read()
+            img_size = len(img_data)
             
             # Request upload parameters
             params = {
                 'media_type': 'image'
             }
             
-            response = requests.post(url, headers=headers, json=params)
+            response = self.transport.post(url, headers=self.headers, json=params)
             
             if response.status_code != 201 and response.status_code != 200:
                 logging.error(f"Failed to get upload parameters. Status: {response.status_code}, Response: {response.text}")
@@ -96,16 +200,15 @@ class PinterestPoster:
                 logging.error("Missing media_id or upload_url in Pinterest response")
                 return None
                 
-            # Upload the image using the provided URL
-            with open(image_path, 'rb') as img_file:
-                upload_response = requests.put(
-                    upload_url,
-                    data=img_file,
-                    headers={
-                        'Content-Type': 'application/octet-stream',
-                        'Content-Length': str(img_size)
-                    }
-                )
+            # Upload the image using the provided URL; bytes rather than the open file so retries can resend them
+            upload_response = self.transport.put(
+                upload_url,
+                data=img_data,
+                headers={
+                    'Content-Type': 'application/octet-stream',
+                    'Content-Length': str(img_size)
+                }
+            )
                 
             if upload_response.status_code != 200:
                 logging.error(f"Failed to upload image. Status: {upload_response.status_code}, Response: {upload_response.text}")
@@ -116,7 +219,7 @@ class PinterestPoster:
             
             # Verify that the media was uploaded successfully
             status_url = f"{self.api_base_url}/media/{media_id}"
-            status_response = requests.get(status_url, headers=headers)
+            status_response = self.transport.get(status_url, headers=self.headers)
             
             if status_response.status_code != 200:
                 logging.error(f"Failed to check media status. Status: {status_response.status_code}, Response: {status_response.text}")
@@ -133,7 +236,7 @@ class PinterestPoster:
             logging.error(f"Error uploading image to Pinterest: {e}")
             return None
             
-    def log_daily_activity(self, products_data, success_count):
+    def log_daily_activity(self, products_data, success_count, skipped_count=0):
         """Log the daily activity for tracking purposes"""
         try:
             today = datetime.now().strftime("%Y-%m-%d")
@@ -141,7 +244,9 @@ class PinterestPoster:
                 'date': today,
                 'total_products_scraped': len(products_data),
                 'successful_pins': success_count,
+                'skipped_duplicates': skipped_count,
                 'board_id': self.board_id,
+                'board_ids': [board['board_id'] for board in self.boards],
                 'product_categories': list(set(p['category'] for p in products_data))
             }
             
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+from scripts.http_transport import get_transport
+
+# stages lists the pipeline stages that cannot run while this check is failing; an empty list makes it warning-only
+PreflightCheck = namedtuple('PreflightCheck', ['name', 'func', 'timeout', 'stages'])
+
+
+def load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_check(check, results):
+    started = time.monotonic()
+    try:
+        outcome = check.func()
+        ok, detail = outcome if isinstance(outcome, tuple) else (bool(outcome), '')
+    except Exception as e:
+        ok, detail = False, f"crashed: {e}"
+    results[check.name] = {'ok': bool(ok), 'detail': detail, 'duration': round(time.monotonic() - started, 3)}
+
+
+def run_preflight(checks, cache_path=None, report_path=None, ttl=None, failed_ttl=None, force=False):
+    """Run independent checks concurrently, each bounded by its own timeout.
+
+    Passing results younger than ttl seconds are reused from the cache, failed
+    ones only for failed_ttl seconds (not at all by default), so a transient
+    failure is retried on the next run. The report, with per-check results and
+    per-stage health, is written as JSON and returned.
+    """
+    cache_path = cache_path or os.environ.get('PREFLIGHT_CACHE', os.path.join('cache', 'preflight.json'))
+    report_path = report_path or os.environ.get('PREFLIGHT_REPORT', os.path.join('logs', 'preflight_report.json'))
+    ttl = ttl if ttl is not None else float(os.environ.get('PREFLIGHT_TTL_SECONDS', '300'))
+    failed_ttl = failed_ttl if failed_ttl is not None else float(os.environ.get('PREFLIGHT_FAILED_TTL_SECONDS', '0'))
+
+    cache = {} if force else load_cache(cache_path)
+    now = time.time()
+    results = {}
+    running = []
+
+    for check in checks:
+        cached = cache.get(check.name)
+        if cached and now - cached.get('checked_at', 0) < (ttl if cached.get('ok') else failed_ttl):
+            results[check.name] = dict(cached, cached=True)
+            continue
+        # Daemon threads, so a hung check cannot keep the process alive
+        thread = threading.Thread(target=run_check, args=(check, results), name=f"preflight-{check.name}", daemon=True)
+        thread.start()
+        running.append((check, thread, time.monotonic() + check.timeout))
+
+    for check, thread, deadline in running:
+        thread.join(max(0, deadline - time.monotonic()))
+        if thread.is_alive() or check.name not in results:
+            logging.error(f"Preflight check '{check.name}' timed out after {check.timeout}s")
+            results[check.name] = {'ok': False, 'detail': f"timed out after {check.timeout}s", 'duration': check.timeout}
+        results[check.name]['cached'] = False
+        results[check.name]['checked_at'] = now
+        cache[check.name] = {key: value for key, value in results[check.name].items() if key != 'cached'}
+
+    stages = {}
+    for check in checks:
+        for stage in check.stages:
+            stages[stage] = stages.get(stage, True) and results[check.name]['ok']
+
+    report = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'ok': all(result['ok'] for result in results.values()),
+        'checks': {check.name: results[check.name] for check in checks},
+        'stages': stages
+    }
+
+    try:
+        save_json(cache_path, cache)
+        save_json(report_path, report)
+    except OSError as e:
+        logging.warning(f"Failed to write preflight report: {e}")
+    return report
+
+
+def check_openai():
+    """OpenAI API key is set and accepted"""
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        return False, 'OPENAI_API_KEY not set'
+    response = get_transport().get('https://api.openai.com/v1/models', headers={'Authorization': f'Bearer {api_key}'}, timeout=(3, 5))
+    return response.status_code == 200, f"HTTP {response.status_code}"
+
+
+def check_pinterest_api():
+    """Pinterest access token is set and accepted"""
+    access_token = os.environ.get('PINTEREST_ACCESS_TOKEN')
+    if not access_token:
+        return False, 'PINTEREST_ACCESS_TOKEN not set'
+    api_base_url = os.environ.get('PINTEREST_API_BASE_URL', 'https://api.pinterest.com/v5').rstrip('/')
+    response = get_transport().get(f"{api_base_url}/user_account", headers={'Authorization': f'Bearer {access_token}'}, timeout=(3, 5))
+    return response.status_code == 200, f"HTTP {response.status_code}"
+
+
+def check_amazon():
+    """Amazon bestseller pages are reachable"""
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    response = get_transport().get('https://www.amazon.com/Best-Sellers/zgbs', headers=headers, timeout=(3, 10))
+    return response.status_code == 200, f"HTTP {response.status_code}"
+
+
+def pipeline_checks():
+    """Checks for the services main.py depends on, mapped to the stages they gate"""
+    return [
+        PreflightCheck('openai', check_openai, 10, ['seo', 'image']),
+        PreflightCheck('pinterest_api', check_pinterest_api, 10, ['post']),
+        # Warning only: Amazon often answers this page with a 503 while the scraper's own retries still get through
+        PreflightCheck('amazon', check_amazon, 15, [])
+    ]
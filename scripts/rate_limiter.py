@@ -0,0 +1,29 @@
+import time
+import random
+import threading
+
+
+class RateLimiter:
+    """Spaces calls at least min_interval seconds apart across all threads.
+
+    Each caller reserves the next free slot under the lock and sleeps outside
+    it, so concurrent senders queue up without holding each other up longer
+    than the interval. Optional jitter adds a random 0..jitter seconds.
+    """
+
+    def __init__(self, min_interval, jitter=0):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until this caller's slot; returns the seconds waited"""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.min_interval + random.uniform(0, self.jitter)
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
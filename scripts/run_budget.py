@@ -0,0 +1,88 @@
+import os
+import time
+
+
+class RunBudget:
+    """Wall-clock and cost budget for one automation run.
+
+    Stages ask level() before doing work and pick cheaper paths as the budget
+    runs down: 'normal' does everything, 'degraded' skips paid image
+    generation, 'critical' also skips live SEO calls, and 'exhausted' means
+    remaining work should be saved for the next run.
+    """
+
+    NORMAL = 'normal'
+    DEGRADED = 'degraded'
+    CRITICAL = 'critical'
+    EXHAUSTED = 'exhausted'
+
+    def __init__(self, time_limit=None, cost_limit=None, reserve_seconds=None):
+        time_limit = time_limit or os.environ.get('RUN_TIME_BUDGET_SECONDS')
+        cost_limit = cost_limit or os.environ.get('RUN_COST_BUDGET')
+        self.time_limit = float(time_limit) if time_limit else None
+        self.cost_limit = float(cost_limit) if cost_limit else None
+        # Time kept back at the end for flushing state and writing logs
+        self.reserve_seconds = reserve_seconds if reserve_seconds is not None else float(os.environ.get('RUN_RESERVE_SECONDS', '30'))
+        self.started = time.monotonic()
+        self.spent = 0.0
+        self.items_done = 0
+        self.item_seconds = 0.0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining_time(self):
+        if self.time_limit is None:
+            return float('inf')
+        return self.time_limit - self.reserve_seconds - self.elapsed()
+
+    def remaining_cost(self):
+        if self.cost_limit is None:
+            return float('inf')
+        return self.cost_limit - self.spent
+
+    def charge(self, amount):
+        self.spent += amount
+
+    def can_afford(self, amount):
+        return amount <= self.remaining_cost()
+
+    def record_item(self, seconds):
+        """Record how long one product took, used to predict whether the next fits"""
+        self.items_done += 1
+        self.item_seconds += seconds
+
+    def estimated_item_seconds(self):
+        return self.item_seconds / self.items_done if self.items_done else 0.0
+
+    def level(self):
+        remaining = self.remaining_time()
+        if remaining <= 0 or self.remaining_cost() <= 0:
+            return self.EXHAUSTED
+        # Not enough time left for another product at the observed pace
+        if remaining < self.estimated_item_seconds():
+            return self.EXHAUSTED
+
+        fractions = []
+        if self.time_limit:
+            fractions.append(remaining / self.time_limit)
+        if self.cost_limit:
+            fractions.append(self.remaining_cost() / self.cost_limit)
+        if not fractions:
+            return self.NORMAL
+
+        fraction = min(fractions)
+        if fraction < 0.25:
+            return self.CRITICAL
+        if fraction < 0.5:
+            return self.DEGRADED
+        return self.NORMAL
+
+    def summary(self):
+        return {
+            'elapsed_seconds': round(self.elapsed(), 1),
+            'time_limit': self.time_limit,
+            'cost_spent': round(self.spent, 4),
+            'cost_limit': self.cost_limit,
+            'level': self.level()
+        }
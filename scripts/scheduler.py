@@ -0,0 +1,105 @@
+import signal
+import logging
+import threading
+from datetime import datetime, timedelta
+
+
+def parse_times(value):
+    """Parse 'HH:MM,HH:MM' into a sorted list of (hour, minute) tuples"""
+    times = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            hour, minute = (int(x) for x in part.split(':'))
+            if not (0 <= hour < 24 and 0 <= minute < 60):
+                raise ValueError
+        except ValueError:
+            logging.error(f"Ignoring invalid schedule time '{part}', expected HH:MM")
+            continue
+        times.append((hour, minute))
+    return sorted(set(times))
+
+
+class Scheduler:
+    """Runs named jobs at fixed times of day inside a long-lived process.
+
+    SIGTERM and SIGINT stop the loop once the running job returns. SIGHUP
+    calls the reload callback between jobs, which may re-register jobs.
+    """
+
+    def __init__(self, on_reload=None):
+        self.jobs = []
+        self.on_reload = on_reload
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.reload_requested = False
+
+    def clear(self):
+        self.jobs = []
+
+    def every_day_at(self, times, name, func):
+        for hour, minute in times:
+            self.jobs.append((hour, minute, name, func))
+        logging.info(f"Scheduled '{name}' at {', '.join(f'{h:02d}:{m:02d}' for h, m in times) or 'no times'}")
+
+    def next_job(self, now):
+        """Return (run_at, name, func) for the next job due after now"""
+        upcoming = []
+        for hour, minute, name, func in self.jobs:
+            run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if run_at <= now:
+                run_at += timedelta(days=1)
+            upcoming.append((run_at, name, func))
+        return min(upcoming, key=lambda job: job[0]) if upcoming else None
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.handle_reload)
+
+    def handle_stop(self, signum, frame):
+        logging.info(f"Received signal {signum}, shutting down after the current job")
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def handle_reload(self, signum, frame):
+        logging.info("Received SIGHUP, reloading configuration")
+        self.reload_requested = True
+        self.wake_event.set()
+
+    def run_forever(self):
+        while not self.stop_event.is_set():
+            if self.reload_requested:
+                self.reload_requested = False
+                if self.on_reload:
+                    try:
+                        self.on_reload()
+                    except Exception as e:
+                        logging.error(f"Reload failed, keeping previous configuration: {e}")
+
+            job = self.next_job(datetime.now())
+            if job is None:
+                logging.warning("No jobs scheduled, waiting for SIGHUP or SIGTERM")
+                self.wake_event.wait()
+                self.wake_event.clear()
+                continue
+
+            run_at, name, func = job
+            delay = (run_at - datetime.now()).total_seconds()
+            # Wake at least once a minute so clock changes and suspends do not skip slots
+            if delay > 0:
+                self.wake_event.wait(min(delay, 60))
+                self.wake_event.clear()
+                if datetime.now() < run_at or self.stop_event.is_set() or self.reload_requested:
+                    continue
+
+            logging.info(f"Running scheduled job '{name}'")
+            try:
+                func()
+            except Exception as e:
+                logging.error(f"Scheduled job '{name}' failed: {e}")
+
+        logging.info("Scheduler stopped")
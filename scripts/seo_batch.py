@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import closing
+import openai
+from scripts.job_queue import JobQueue
+
+
+def seo_custom_id(product):
+    """Stable ID joining a batch request line to its product"""
+    return f"seo-{JobQueue.job_key(product)}"
+
+
+class SeoCache:
+    """SQLite store of SEO content produced by batch jobs, keyed by custom ID"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.environ.get('SEO_CACHE_DB', os.path.join('cache', 'seo_cache.db'))
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self.connect()) as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS seo (custom_id TEXT PRIMARY KEY, content TEXT NOT NULL, created REAL NOT NULL)')
+
+    def connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def get(self, custom_id):
+        with closing(self.connect()) as conn:
+            row = conn.execute('SELECT content FROM seo WHERE custom_id = ?', (custom_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def contains(self, custom_id):
+        with closing(self.connect()) as conn:
+            return conn.execute('SELECT 1 FROM seo WHERE custom_id = ?', (custom_id,)).fetchone() is not None
+
+    def put_many(self, items):
+        """Store (custom_id, content) pairs from an iterator in one transaction"""
+        count = 0
+        now = time.time()
+        with closing(self.connect()) as conn:
+            conn.execute('BEGIN')
+            for custom_id, content in items:
+                conn.execute('INSERT OR REPLACE INTO seo (custom_id, content, created) VALUES (?, ?, ?)', (custom_id, json.dumps(content), now))
+                count += 1
+            conn.execute('COMMIT')
+        return count
+
+
+class SeoBatch:
+    """Offline SEO generation through the OpenAI Batch API.
+
+    submit() writes one chat request per uncached product to a JSONL file and
+    starts a batch job; collect() polls it and streams the results file into
+    the SeoCache line by line. Setting OPENAI_BASE_URL points the client at a
+    local stand-in for the batch endpoints.
+    """
+
+    TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+    def __init__(self, cache=None, batch_dir=None, state_path=None):
+        self.cache = cache or SeoCache()
+        self.batch_dir = batch_dir or os.environ.get('SEO_BATCH_DIR', 'batch')
+        self.state_path = state_path or os.path.join(self.batch_dir, 'seo_batch_state.json')
+        os.makedirs(self.batch_dir, exist_ok=True)
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def last_submitted(self):
+        """Submission time of the pending or most recently collected batch, or None if there never was one"""
+        state = self.load_state()
+        return state.get('submitted') or state.get('last_submitted')
+
+    def save_state(self, state):
+        with open(self.state_path, 'w') as f:
+            json.dump(state, f, indent=2)
+
+    def write_requests(self, products, path, request_body):
+        """Write batch request lines for products not already cached; returns the count"""
+        count = 0
+        seen = set()
+        with open(path, 'w') as f:
+            for product in products:
+                custom_id = seo_custom_id(product)
+                if custom_id in seen or self.cache.contains(custom_id):
+                    continue
+                seen.add(custom_id)
+                line = {
+                    'custom_id': custom_id,
+                    'method': 'POST',
+                    'url': '/v1/chat/completions',
+                    'body': request_body(product)
+                }
+                f.write(json.dumps(line) + '\n')
+                count += 1
+        return count
+
+    def submit(self, products, request_body):
+        """Start a batch job for uncached products, returning its ID or None"""
+        state = self.load_state()
+        if state.get('batch_id'):
+            logging.info(f"Batch {state['batch_id']} is still pending, collect it before submitting another")
+            return state['batch_id']
+
+        path = os.path.join(self.batch_dir, f"seo_requests_{int(time.time())}.jsonl")
+        count = self.write_requests(products, path, request_body)
+        if not count:
+            os.remove(path)
+            logging.info("All products already have cached SEO content, nothing to batch")
+            return None
+
+        with open(path, 'rb') as f:
+            input_file = openai.files.create(file=f, purpose='batch')
+        batch = openai.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h'
+        )
+        self.save_state({'batch_id': batch.id, 'input_path': path, 'requests': count, 'submitted': int(time.time())})
+        logging.info(f"Submitted SEO batch {batch.id} with {count} requests")
+        return batch.id
+
+    def poll(self, batch_id, timeout=0, interval=30):
+        """Return the batch once it reaches a terminal status, or the latest state after timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            batch = openai.batches.retrieve(batch_id)
+            if batch.status in self.TERMINAL_STATUSES or time.monotonic() >= deadline:
+                return batch
+            logging.info(f"Batch {batch_id} is {batch.status}, checking again in {interval}s")
+            time.sleep(interval)
+
+    def iter_results(self, file_id):
+        """Stream (custom_id, seo_content) pairs from a results file without loading it whole"""
+        with openai.files.with_streaming_response.content(file_id) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    result = json.loads(line)
+                    response_body = (result.get('response') or {}).get('body') or {}
+                    content = response_body['choices'][0]['message']['content']
+                    yield result['custom_id'], json.loads(content)
+                except (KeyError, IndexError, ValueError) as e:
+                    logging.warning(f"Skipping unusable batch result line: {e}")
+
+    def collect(self, timeout=0):
+        """Store the pending batch's results in the cache; returns how many were stored"""
+        state = self.load_state()
+        batch_id = state.get('batch_id')
+        if not batch_id:
+            logging.info("No pending SEO batch")
+            return 0
+
+        batch = self.poll(batch_id, timeout)
+        if batch.status not in self.TERMINAL_STATUSES:
+            logging.info(f"Batch {batch_id} is still {batch.status}")
+            return 0
+
+        stored = 0
+        if batch.status == 'completed' and batch.output_file_id:
+            stored = self.cache.put_many(self.iter_results(batch.output_file_id))
+            logging.info(f"Stored SEO content for {stored}/{state.get('requests')} products from batch {batch_id}")
+        else:
+            logging.error(f"Batch {batch_id} ended with status {batch.status}")
+
+        self.save_state({'last_submitted': state.get('submitted')})
+        return stored
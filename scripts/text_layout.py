@@ -0,0 +1,193 @@
+import os
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from PIL import ImageFont
+
+FONT_CANDIDATES = [
+    'Arial.ttf',
+    'DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    '/Library/Fonts/Arial.ttf',
+    'C:\\Windows\\Fonts\\arial.ttf'
+]
+
+ELLIPSIS = '...'
+
+TextLayout = namedtuple('TextLayout', ['lines', 'font', 'size', 'line_height', 'width', 'height'])
+
+
+class TextLayoutEngine:
+    """Fits text into fixed pixel boxes using cached glyph advance widths.
+
+    Lines are wrapped by measured pixel width instead of character count. If
+    the text does not fit at the largest size, the font size steps down until
+    it does; at the smallest size the last line is ellipsized. Layouts are
+    memoized by text and box, so repeated titles cost a dictionary lookup.
+    """
+
+    def __init__(self, font_path=None, max_layouts=2048):
+        self.font_path = font_path or os.environ.get('LAYOUT_FONT_PATH') or self.find_font()
+        self.max_layouts = max_layouts
+        self.fonts = {}
+        self.advances = {}
+        self.layouts = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def find_font():
+        for path in FONT_CANDIDATES:
+            try:
+                ImageFont.truetype(path, 10)
+                return path
+            except IOError:
+                continue
+        logging.warning("No TrueType font found, text will use the fixed-size default font")
+        return None
+
+    def get_font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = ImageFont.truetype(self.font_path, size) if self.font_path else ImageFont.load_default()
+            self.fonts[size] = font
+            self.advances[size] = {}
+        return font
+
+    def measure(self, text, size):
+        """Width of text in pixels, summed from cached per-glyph advances"""
+        font = self.get_font(size)
+        advances = self.advances[size]
+        width = 0.0
+        for char in text:
+            advance = advances.get(char)
+            if advance is None:
+                advance = advances[char] = font.getlength(char)
+            width += advance
+        return width
+
+    def line_height(self, size):
+        font = self.get_font(size)
+        if hasattr(font, 'getmetrics'):
+            ascent, descent = font.getmetrics()
+            return int((ascent + descent) * 1.1)
+        return font.getbbox('Ay')[3] + 2
+
+    def wrap(self, text, size, max_width):
+        """Greedy word wrap by pixel width, breaking words that are wider than a line"""
+        space = self.measure(' ', size)
+        lines = []
+        current = ''
+        current_width = 0.0
+
+        for word in text.split():
+            word_width = self.measure(word, size)
+            if word_width > max_width:
+                # Hard-break a word that cannot fit on any line
+                if current:
+                    lines.append(current)
+                    current, current_width = '', 0.0
+                for char in word:
+                    char_width = self.measure(char, size)
+                    if current and current_width + char_width > max_width:
+                        lines.append(current)
+                        current, current_width = '', 0.0
+                    current += char
+                    current_width += char_width
+                continue
+
+            if not current:
+                current, current_width = word, word_width
+            elif current_width + space + word_width <= max_width:
+                current += ' ' + word
+                current_width += space + word_width
+            else:
+                lines.append(current)
+                current, current_width = word, word_width
+
+        if current:
+            lines.append(current)
+        return lines
+
+    def ellipsize(self, line, size, max_width):
+        while line and self.measure(line + ELLIPSIS, size) > max_width:
+            line = line[:-1]
+        return line.rstrip() + ELLIPSIS
+
+    def fits(self, lines, size, box_width):
+        # Final check with the font's own shaping, which may include kerning
+        font = self.get_font(size)
+        return all(font.getlength(line) <= box_width for line in lines)
+
+    def fit(self, text, box_width, box_height, max_size, min_size=None, max_lines=None, step=2):
+        """Return the TextLayout of text in the largest size that fits the box"""
+        min_size = min_size or max_size
+        key = (text, box_width, box_height, max_size, min_size, max_lines, step)
+        with self.lock:
+            layout = self.layouts.get(key)
+            if layout is not None:
+                self.layouts.move_to_end(key)
+                return layout
+
+            layout = self.compute(text, box_width, box_height, max_size, min_size, max_lines, step)
+            self.layouts[key] = layout
+            if len(self.layouts) > self.max_layouts:
+                self.layouts.popitem(last=False)
+            return layout
+
+    def compute(self, text, box_width, box_height, max_size, min_size, max_lines, step):
+        text = ' '.join(text.split())
+        sizes = list(range(max_size, min_size - 1, -step)) if self.font_path else [max_size]
+        if sizes[-1] != min_size and self.font_path:
+            sizes.append(min_size)
+
+        for size in sizes:
+            line_height = self.line_height(size)
+            lines = self.wrap(text, size, box_width)
+            allowed = max(1, box_height // line_height)
+            if max_lines:
+                allowed = min(allowed, max_lines)
+            if len(lines) <= allowed and self.fits(lines, size, box_width):
+                return self.build(lines, size, line_height)
+
+        # Smallest size still overflows: keep the lines that fit and ellipsize the last one
+        size = sizes[-1]
+        line_height = self.line_height(size)
+        allowed = max(1, box_height // line_height)
+        if max_lines:
+            allowed = min(allowed, max_lines)
+        lines = self.wrap(text, size, box_width)
+        if len(lines) > allowed:
+            lines = lines[:allowed]
+            lines[-1] = self.ellipsize(lines[-1], size, box_width)
+        lines = [line if self.fits([line], size, box_width) else self.ellipsize(line, size, box_width) for line in lines]
+        return self.build(lines, size, line_height)
+
+    def build(self, lines, size, line_height):
+        width = max((self.measure(line, size) for line in lines), default=0)
+        return TextLayout(lines, self.get_font(size), size, line_height, int(width), line_height * len(lines))
+
+    def draw(self, draw, text, box, max_size, min_size=None, fill=(255, 255, 255), max_lines=None):
+        """Fit text into box (left, top, right, bottom) and draw it centered"""
+        left, top, right, bottom = box
+        layout = self.fit(text, right - left, bottom - top, max_size, min_size, max_lines)
+
+        y = top + (bottom - top - layout.height) / 2
+        for line in layout.lines:
+            x = left + (right - left - layout.font.getlength(line)) / 2
+            draw.text((x, y), line, fill=fill, font=layout.font)
+            y += layout.line_height
+        return layout
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_layout_engine():
+    """Process-wide layout engine, so glyph metrics and layouts are shared"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TextLayoutEngine()
+        return _engine
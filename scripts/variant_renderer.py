@@ -0,0 +1,103 @@
+import io
+import threading
+from PIL import Image, ImageDraw, ImageFilter
+from scripts.text_layout import get_layout_engine
+
+# Pinterest-friendly canvases: square feed pin, 2:3 standard pin, 9:16 idea pin
+FORMATS = {
+    'square': (1024, 1024),
+    'pin': (1000, 1500),
+    'idea': (1080, 1920)
+}
+
+
+class VariantRenderer:
+    """Renders several pin layouts from one decoded base image.
+
+    The base is converted once; per format only a resize, a paste and the
+    text draw happen. Badge/band overlay layers are cached per canvas size and
+    text layouts come memoized from the shared layout engine.
+    """
+
+    def __init__(self, layout=None, image_format='PNG'):
+        self.layout = layout or get_layout_engine()
+        self.image_format = image_format
+        self.layers = {}
+        self.lock = threading.Lock()
+
+    def template_layer(self, size):
+        """Transparent overlay with the bestseller badge and the text band for a canvas size"""
+        with self.lock:
+            layer = self.layers.get(size)
+            if layer is None:
+                width, height = size
+                badge_height, band_height = self.bands(size)
+                layer = Image.new('RGBA', size, (0, 0, 0, 0))
+                draw = ImageDraw.Draw(layer)
+                draw.rectangle([(0, 0), (width, badge_height)], fill=(254, 189, 105, 230))
+                draw.rectangle([(0, height - band_height), (width, height)], fill=(0, 0, 0, 180))
+                self.layers[size] = layer
+            return layer
+
+    @staticmethod
+    def bands(size):
+        """Badge and text band heights, scaled from the 1024px square design"""
+        width, height = size
+        return round(80 * width / 1024), round(300 * width / 1024)
+
+    def compose_base(self, base, backdrop, size):
+        """Fit the base above the text band over a blurred cover of itself"""
+        width, height = size
+        badge_height, band_height = self.bands(size)
+
+        if base.size == size:
+            return base.copy()
+
+        # Contain the base between badge and band, keeping its aspect ratio
+        canvas = backdrop.resize(size, Image.BILINEAR)
+        area_height = height - badge_height - band_height
+        scale = min(width / base.width, area_height / base.height)
+        fitted = base.resize((max(1, round(base.width * scale)), max(1, round(base.height * scale))), Image.LANCZOS)
+        top = badge_height + max(0, (area_height - fitted.height) // 2)
+        canvas.paste(fitted, ((width - fitted.width) // 2, top))
+        return canvas
+
+    def draw_text(self, image, product_data, size):
+        width, height = size
+        badge_height, band_height = self.bands(size)
+        scale = width / 1024
+        draw = ImageDraw.Draw(image)
+
+        badge_text = f"AMAZON BESTSELLER - {product_data['category']}"
+        margin = round(20 * scale)
+        self.layout.draw(draw, badge_text, (margin, round(10 * scale), width - margin, badge_height - round(10 * scale)), round(30 * scale), round(18 * scale), fill=(0, 0, 0), max_lines=1)
+
+        # Same proportions as the square design: title, price and CTA stacked in the band
+        margin = round(40 * scale)
+        band_top = height - band_height
+        title_bottom = band_top + round(155 * scale)
+        price_bottom = band_top + round(230 * scale)
+        self.layout.draw(draw, product_data['title'], (margin, band_top + round(10 * scale), width - margin, title_bottom), round(40 * scale), round(22 * scale), fill=(255, 255, 255), max_lines=3)
+        self.layout.draw(draw, product_data['price'], (margin, title_bottom, width - margin, price_bottom), round(50 * scale), round(28 * scale), fill=(254, 189, 105), max_lines=1)
+        self.layout.draw(draw, "Check it out on Amazon", (margin, price_bottom, width - margin, height - round(20 * scale)), round(30 * scale), round(18 * scale), fill=(255, 255, 255), max_lines=1)
+
+    def encode(self, image):
+        buffer = io.BytesIO()
+        image.save(buffer, format=self.image_format)
+        return buffer.getvalue()
+
+    def render(self, base, product_data, formats=None):
+        """Return {format name: encoded bytes} for each requested format"""
+        formats = formats or list(FORMATS)
+        base = base.convert('RGB')
+        # Blur a thumbnail once; every format scales it up as its backdrop
+        backdrop = base.resize((64, 64), Image.BILINEAR).filter(ImageFilter.GaussianBlur(4))
+
+        variants = {}
+        for name in formats:
+            size = FORMATS[name]
+            canvas = self.compose_base(base, backdrop, size).convert('RGBA')
+            image = Image.alpha_composite(canvas, self.template_layer(size)).convert('RGB')
+            self.draw_text(image, product_data, size)
+            variants[name] = self.encode(image)
+        return variants
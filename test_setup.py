@@ -7,17 +7,11 @@ Run this to debug issues before running the main bot
 import os
 import sys
 import logging
+import argparse
 from datetime import datetime
+from scripts.preflight import PreflightCheck, run_preflight, pipeline_checks
+from scripts.log_setup import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('test_setup.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 def test_imports():
@@ -168,30 +162,22 @@ def test_amazon_scraping():
         logger.error(f"❌ Amazon access: FAILED - {e}")
         return False
 
-def main():
-    """Run all tests"""
+def main(force=False):
+    """Run all tests concurrently, each with its own deadline"""
     logger.info("="*50)
     logger.info("Amazon to Pinterest Bot - Setup Test")
     logger.info(f"Test started at: {datetime.now()}")
     logger.info("="*50)
     
     tests = [
-        ("Import Test", test_imports),
-        ("Environment Variables", test_environment_variables),
-        ("Chrome Setup", test_chrome_setup),
-        ("Pinterest Connection", test_pinterest_connection),
-        ("Amazon Access", test_amazon_scraping),
-    ]
+        PreflightCheck("Import Test", test_imports, 30, ['bot']),
+        PreflightCheck("Environment Variables", test_environment_variables, 5, ['bot']),
+        PreflightCheck("Chrome Setup", test_chrome_setup, 60, ['bot']),
+        PreflightCheck("Pinterest Connection", test_pinterest_connection, 45, ['bot']),
+        PreflightCheck("Amazon Access", test_amazon_scraping, 15, ['bot']),
+    ] + pipeline_checks()
     
-    results = {}
-    
-    for test_name, test_func in tests:
-        logger.info(f"\n🧪 Running {test_name}...")
-        try:
-            results[test_name] = test_func()
-        except Exception as e:
-            logger.error(f"Test {test_name} crashed: {e}")
-            results[test_name] = False
+    report = run_preflight(tests, force=force)
     
     # Summary
     logger.info("\n" + "="*50)
@@ -199,15 +185,18 @@ def main():
     logger.info("="*50)
     
     passed = 0
-    total = len(results)
-    
-    for test_name, result in results.items():
-        status = "✅ PASS" if result else "❌ FAIL"
-        logger.info(f"{test_name}: {status}")
-        if result:
+    total = len(report['checks'])
+    
+    for test_name, result in report['checks'].items():
+        status = "✅ PASS" if result['ok'] else "❌ FAIL"
+        cached = " (cached)" if result.get('cached') else ""
+        detail = f" - {result['detail']}" if result.get('detail') else ""
+        logger.info(f"{test_name}: {status}{cached} [{result['duration']}s]{detail}")
+        if result['ok']:
             passed += 1
     
     logger.info(f"\nOverall: {passed}/{total} tests passed")
+    logger.info(f"Stage health: {report['stages']}")
     
     if passed == total:
         logger.info("🎉 All tests passed! Your setup is ready.")
@@ -217,5 +206,11 @@ def main():
         return False
 
 if __name__ == "__main__":
-    success = main()
+    # Configure logging
+    setup_logging('test_setup.log')
+
+    parser = argparse.ArgumentParser(description="Preflight checks for the Amazon to Pinterest automation")
+    parser.add_argument('--force', action='store_true', help="ignore cached results and re-run every check")
+    args = parser.parse_args()
+    success = main(force=args.force)
     sys.exit(0 if success else 1)
@@ -0,0 +1,108 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+from scripts.job_queue import JobQueue, LeaseHeartbeat
+
+
+def drain(db_path, worker_id):
+    """Worker process: lease and finish jobs until the queue is empty"""
+    queue = JobQueue(db_path)
+    leased = []
+    while True:
+        job = queue.lease(worker_id)
+        if job is None:
+            return leased
+        leased.append(job['id'])
+        time.sleep(0.01)
+        assert queue.finish(job['id'], worker_id, True)
+
+
+def lease_and_crash(db_path, worker_id):
+    """Worker process: lease one job and exit without finishing it"""
+    return JobQueue(db_path, lease_seconds=1).lease(worker_id)['id']
+
+
+def products(count):
+    return [{'title': f"Product {i}", 'product_url': f"https://www.amazon.com/dp/{i}"} for i in range(count)]
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'jobs.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_each_job_is_leased_once_across_processes(self):
+        queue = JobQueue(self.db_path)
+        self.assertEqual(queue.enqueue(products(40)), 40)
+        self.assertEqual(queue.enqueue(products(40)), 0)
+
+        with multiprocessing.Pool(4) as pool:
+            results = pool.starmap(drain, [(self.db_path, f"worker-{i}") for i in range(4)])
+
+        leased = [job_id for result in results for job_id in result]
+        self.assertEqual(len(leased), 40)
+        self.assertEqual(len(set(leased)), 40)
+        self.assertEqual(queue.counts(), {'done': 40})
+        self.assertFalse(queue.has_live_work())
+
+    def test_expired_lease_is_taken_over(self):
+        queue = JobQueue(self.db_path, lease_seconds=1)
+        queue.enqueue(products(1))
+
+        process = multiprocessing.Process(target=lease_and_crash, args=(self.db_path, 'crashed'))
+        process.start()
+        process.join()
+        self.assertIsNone(queue.lease('other'))
+
+        time.sleep(1.2)
+        job = queue.lease('other')
+        self.assertIsNotNone(job)
+        self.assertEqual(job['attempts'], 2)
+        self.assertFalse(queue.heartbeat(job['id'], 'crashed'))
+        self.assertFalse(queue.finish(job['id'], 'crashed', True))
+        self.assertTrue(queue.finish(job['id'], 'other', True))
+        self.assertEqual(queue.counts(), {'done': 1})
+
+    def test_expired_last_attempt_is_marked_failed(self):
+        queue = JobQueue(self.db_path, lease_seconds=1, max_attempts=1)
+        queue.enqueue(products(1))
+
+        process = multiprocessing.Process(target=lease_and_crash, args=(self.db_path, 'crashed'))
+        process.start()
+        process.join()
+        self.assertTrue(queue.has_live_work())
+
+        time.sleep(1.2)
+        self.assertIsNone(queue.lease('other'))
+        self.assertEqual(queue.counts(), {'failed': 1})
+        self.assertFalse(queue.has_live_work())
+
+    def test_failed_job_stops_after_max_attempts(self):
+        queue = JobQueue(self.db_path, max_attempts=2)
+        queue.enqueue(products(1))
+        for _ in range(2):
+            job = queue.lease('worker')
+            self.assertTrue(queue.finish(job['id'], 'worker', False))
+        self.assertIsNone(queue.lease('worker'))
+        self.assertEqual(queue.counts(), {'failed': 1})
+
+    def test_heartbeat_confirm_fails_after_takeover(self):
+        queue = JobQueue(self.db_path, lease_seconds=1)
+        queue.enqueue(products(1))
+        job = queue.lease('slow')
+        with LeaseHeartbeat(queue, job['id'], 'slow', interval=60) as lease:
+            self.assertTrue(lease.confirm())
+            time.sleep(1.2)
+            self.assertIsNotNone(queue.lease('other'))
+            self.assertFalse(lease.confirm())
+            self.assertTrue(lease.lost)
+
+
+if __name__ == '__main__':
+    unittest.main()